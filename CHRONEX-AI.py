@@ -6,36 +6,85 @@ Requirements: flask, nltk, requests, numpy, python-dotenv, openai, pillow
 Creator: DEMON ALEX CREATOR OF CHRONEX AI
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import json
 import os
 import random
 import string
 import re
+import asyncio
+import threading
+import importlib
+import importlib.util
+import time
+import queue
+import hashlib
+import copy
+import math
+import uuid
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 import logging
 import base64
 from pathlib import Path
 
-# Try importing AI libraries
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+# Heavy AI libraries are imported lazily on first use so the server can
+# start answering (e.g. /ai/health) before they are loaded
+class LazyModule:
+    """Module proxy that defers an expensive import until an attribute is used"""
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    object.__setattr__(self, "_module", importlib.import_module(self._name))
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+def module_available(name):
+    """Check a library is installed without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+OPENAI_AVAILABLE = module_available("openai")
+openai = LazyModule("openai")
+
+HUGGINGFACE_AVAILABLE = module_available("transformers")
+transformers = LazyModule("transformers")
+
+# Optional CPU backends for the local model (ONNX Runtime through optimum, int8 through torch)
+ONNX_AVAILABLE = module_available("optimum") and module_available("onnxruntime")
+TORCH_AVAILABLE = module_available("torch")
+
+PILLOW_AVAILABLE = module_available("PIL")
+Image = LazyModule("PIL.Image")
 
 try:
-    from transformers import pipeline
-    HUGGINGFACE_AVAILABLE = True
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
 except ImportError:
-    HUGGINGFACE_AVAILABLE = False
+    REQUESTS_AVAILABLE = False
 
 try:
-    from PIL import Image
-    PILLOW_AVAILABLE = True
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
 except ImportError:
-    PILLOW_AVAILABLE = False
+    AIOHTTP_AVAILABLE = False
 
 try:
     from dotenv import load_dotenv
@@ -179,13 +228,85 @@ class ConfigManager:
         """Load config from .env, config.json, or defaults"""
         config = {
             "ai_provider": os.getenv("AI_PROVIDER", "openai"),  # openai, huggingface, ollama, default
+            "provider_chain": os.getenv("AI_PROVIDER_CHAIN", ""),  # e.g. "openai,ollama,huggingface"; empty = ai_provider only
+            "cascade_enabled": to_bool(os.getenv("CASCADE_ENABLED", "False")),  # route by complexity instead of the chain
+            "cascade_routes": os.getenv("CASCADE_ROUTES", "simple=ollama;intermediate=ollama,openai;advanced=openai"),  # tier=provider[@model],...
+            "cascade_upgrade_intents": os.getenv("CASCADE_UPGRADE_INTENTS", "coding,math"),  # never answered by the simple tier
+            "cascade_escalate": to_bool(os.getenv("CASCADE_ESCALATE", "True")),  # retry a weak answer on the next tier
+            "cascade_min_answer_chars": int(os.getenv("CASCADE_MIN_ANSWER_CHARS", "20")),
             "openai_api_key": os.getenv("OPENAI_API_KEY", ""),
             "openai_model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+            "openai_api_keys": os.getenv("OPENAI_API_KEYS", ""),  # key pool: "key[|org[|model]],..."; empty = openai_api_key
+            "openai_key_cooldown": float(os.getenv("OPENAI_KEY_COOLDOWN", "20")),  # seconds a key rests after a 429 without Retry-After
+            "openai_api_base": os.getenv("OPENAI_API_BASE", ""),  # e.g. the local stub server; empty = api.openai.com
             "huggingface_model": os.getenv("HF_MODEL", "gpt2"),
+            "huggingface_backend": os.getenv("HF_BACKEND", "pytorch"),  # pytorch, onnx, int8
+            "onnx_model_path": os.getenv("ONNX_MODEL_PATH", ""),  # exported ONNX dir; empty = export huggingface_model on load
+            "inference_threads": int(os.getenv("INFERENCE_THREADS", "0")),  # CPU threads per model; 0 = library default
             "ollama_endpoint": os.getenv("OLLAMA_ENDPOINT", "http://localhost:11434"),
+            "ollama_model": os.getenv("OLLAMA_MODEL", "llama3"),
+            "ollama_keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),  # how long Ollama keeps the model loaded; -1 = forever
+            "ollama_preload": to_bool(os.getenv("OLLAMA_PRELOAD", "True")),  # load the model during warm-up
+            "ollama_ping_interval": float(os.getenv("OLLAMA_PING_INTERVAL", "240")),  # idle seconds before a keep-alive ping; 0 = off
+            "ollama_pool_size": int(os.getenv("OLLAMA_POOL_SIZE", "20")),  # total keep-alive connections
+            "ollama_pool_per_host": int(os.getenv("OLLAMA_POOL_PER_HOST", "10")),  # connections per host
+            "ollama_connect_timeout": float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3")),
+            "ollama_read_timeout": float(os.getenv("OLLAMA_READ_TIMEOUT", "30")),
             "temperature": float(os.getenv("AI_TEMPERATURE", "0.7")),
             "max_tokens": int(os.getenv("AI_MAX_TOKENS", "1000")),
             "use_real_ai": to_bool(os.getenv("USE_REAL_AI", "True")),
+            "background_warmup": to_bool(os.getenv("BACKGROUND_WARMUP", "True")),  # load models after startup
+            "chat_deadline_ms": int(os.getenv("CHAT_DEADLINE_MS", "20000")),  # 0 = wait for the provider indefinitely
+            "chat_workers": int(os.getenv("CHAT_WORKERS", "32")),  # threads running provider calls against deadlines
+            "chat_batch_workers": int(os.getenv("CHAT_BATCH_WORKERS", "8")),  # batch items processed at once
+            "chat_batch_max_items": int(os.getenv("CHAT_BATCH_MAX_ITEMS", "64")),  # larger batches are rejected
+            "context_token_budget": int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024")),  # history tokens per prompt
+            "context_turn_max_tokens": int(os.getenv("CONTEXT_TURN_MAX_TOKENS", "256")),  # longer turns are truncated
+            "context_tokenizer": os.getenv("CONTEXT_TOKENIZER", "auto"),  # auto (local HF tokenizer if cached), regex
+            "fast_path_enabled": to_bool(os.getenv("FAST_PATH_ENABLED", "True")),  # answer greetings/status/creator locally
+            "fast_path_intents": os.getenv("FAST_PATH_INTENTS", "greeting,status,creator"),
+            "fast_path_max_words": int(os.getenv("FAST_PATH_MAX_WORDS", "8")),  # longer messages always go to the provider
+            "session_shards": int(os.getenv("SESSION_SHARDS", "16")),  # independently locked slices of the session store
+            "session_max_sessions": int(os.getenv("SESSION_MAX_SESSIONS", "10000")),  # least recently used go first
+            "session_max_turns": int(os.getenv("SESSION_MAX_TURNS", "200")),  # ring buffer size; older turns live on in the summary
+            "session_idle_ttl": float(os.getenv("SESSION_IDLE_TTL", "3600")),  # seconds; 0 = keep idle sessions
+            "summary_enabled": to_bool(os.getenv("SUMMARY_ENABLED", "True")),
+            "summary_max_tokens": int(os.getenv("SUMMARY_MAX_TOKENS", "256")),
+            "summary_use_ai": to_bool(os.getenv("SUMMARY_USE_AI", "False")),  # False = cheap extractive summaries
+            "summary_workers": int(os.getenv("SUMMARY_WORKERS", "2")),  # background folds never use chat threads
+            "response_cache_enabled": to_bool(os.getenv("RESPONSE_CACHE_ENABLED", "True")),
+            "response_cache_size": int(os.getenv("RESPONSE_CACHE_SIZE", "512")),  # in-memory entries
+            "response_cache_ttl": float(os.getenv("RESPONSE_CACHE_TTL", "3600")),  # seconds
+            "response_cache_dir": os.getenv("RESPONSE_CACHE_DIR", ""),  # empty = no disk tier
+            "response_cache_disk_max_mb": float(os.getenv("RESPONSE_CACHE_DISK_MAX_MB", "50")),
+            "response_cache_max_temperature": float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.7")),  # hotter = bypass
+            "coalesce_enabled": to_bool(os.getenv("COALESCE_ENABLED", "True")),
+            "coalesce_timeout": float(os.getenv("COALESCE_TIMEOUT", "60")),  # seconds a duplicate waits for the leader
+            "breaker_failure_rate": float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),  # open above this failure ratio
+            "breaker_min_calls": int(os.getenv("BREAKER_MIN_CALLS", "5")),
+            "breaker_window": int(os.getenv("BREAKER_WINDOW", "20")),  # recent calls considered
+            "breaker_slow_call_seconds": float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "0")),  # slower calls count as failures; 0 = off, the read timeouts already fail hung calls
+            "breaker_open_seconds": float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+            "breaker_half_open_probes": int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1")),
+            "provider_max_concurrency": int(os.getenv("PROVIDER_MAX_CONCURRENCY", "8")),  # in-flight calls per provider
+            "provider_max_queue": int(os.getenv("PROVIDER_MAX_QUEUE", "32")),  # waiting calls before shedding load
+            "provider_max_queue_wait": float(os.getenv("PROVIDER_MAX_QUEUE_WAIT", "5")),  # seconds a call may wait
+            "adaptive_timeout_percentile": float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", "0.99")),
+            "adaptive_timeout_multiplier": float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0")),  # timeout = pXX * multiplier
+            "adaptive_timeout_min": float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "2")),  # seconds
+            "adaptive_timeout_max": float(os.getenv("ADAPTIVE_TIMEOUT_MAX", "60")),  # seconds; also used until warmed up
+            "adaptive_timeout_min_samples": int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "20")),
+            "retry_max_attempts": int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            "retry_base_delay": float(os.getenv("RETRY_BASE_DELAY", "0.2")),  # seconds, doubled per attempt, full jitter
+            "retry_max_delay": float(os.getenv("RETRY_MAX_DELAY", "2")),
+            "provider_request_deadline": float(os.getenv("PROVIDER_REQUEST_DEADLINE", "45")),  # all attempts of one call
+            "hf_batch_enabled": to_bool(os.getenv("HF_BATCH_ENABLED", "True")),
+            "hf_max_batch_size": int(os.getenv("HF_MAX_BATCH_SIZE", "8")),
+            "hf_max_batch_wait_ms": float(os.getenv("HF_MAX_BATCH_WAIT_MS", "10")),
+            "hf_request_timeout": float(os.getenv("HF_REQUEST_TIMEOUT", "120")),  # seconds a request waits for its batch
+            "prefix_cache_enabled": to_bool(os.getenv("PREFIX_CACHE_ENABLED", "True")),  # reuse persona attention state
+            "prefix_cache_memory_mb": float(os.getenv("PREFIX_CACHE_MEMORY_MB", "256")),
+            "prefix_cache_sessions": to_bool(os.getenv("PREFIX_CACHE_SESSIONS", "True")),  # also cache persona + summary
             "enable_vision": to_bool(os.getenv("ENABLE_VISION", "True")),
         }
         
@@ -212,6 +333,1317 @@ class ConfigManager:
 # Initialize Config Manager
 config_manager = ConfigManager()
 
+# ============ PROVIDER TRANSPORT ============
+class ProviderTransport:
+    """
+    Pooled keep-alive HTTP transport for provider servers (Ollama)
+    One instance is shared by all Flask threads; the async path gets its own
+    aiohttp session per event loop with the same pool limits
+    """
+    def __init__(self, base_url, pool_size=20, per_host_limit=10, connect_timeout=3.0, read_timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = max(1, int(pool_size))
+        self.per_host_limit = max(1, min(int(per_host_limit), self.pool_size))
+        self.connect_timeout = float(connect_timeout)
+        self.read_timeout = float(read_timeout)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_sessions = {}
+
+    @classmethod
+    def from_config(cls, config, prefix="ollama"):
+        """Build a transport from ConfigManager keys (<prefix>_endpoint, <prefix>_pool_size, ...)"""
+        return cls(
+            config.get(f"{prefix}_endpoint", "http://localhost:11434"),
+            pool_size=config.get(f"{prefix}_pool_size", 20),
+            per_host_limit=config.get(f"{prefix}_pool_per_host", 10),
+            connect_timeout=config.get(f"{prefix}_connect_timeout", 3.0),
+            read_timeout=config.get(f"{prefix}_read_timeout", 30.0),
+        )
+
+    def url(self, path):
+        """Absolute URL for an API path"""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    @property
+    def session(self):
+        """Lazily created requests session with a bounded, blocking connection pool"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    if not REQUESTS_AVAILABLE:
+                        raise RuntimeError("requests is not installed")
+                    session = requests.Session()
+                    # requests keeps one pool per host: split the total budget into per-host pools
+                    adapter = HTTPAdapter(
+                        pool_connections=max(1, self.pool_size // self.per_host_limit),
+                        pool_maxsize=self.per_host_limit,
+                        pool_block=True,
+                    )
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+                    logger.info(f"🔌 Provider transport ready: {self.base_url} (pool {self.pool_size}, per host {self.per_host_limit})")
+        return self._session
+
+    def get_json(self, path, read_timeout=None):
+        """GET over a pooled keep-alive connection and return the decoded body"""
+        response = self.session.get(self.url(path), timeout=(self.connect_timeout, read_timeout or self.read_timeout))
+        response.raise_for_status()
+        return response.json()
+
+    def post_json(self, path, payload, read_timeout=None):
+        """POST JSON over a pooled keep-alive connection and return the decoded body"""
+        response = self.session.post(
+            self.url(path),
+            json=payload,
+            timeout=(self.connect_timeout, read_timeout or self.read_timeout),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def stream_json_lines(self, path, payload, read_timeout=None):
+        """POST JSON and yield each decoded line of a newline-delimited JSON stream"""
+        with self.session.post(
+            self.url(path),
+            json=payload,
+            stream=True,
+            timeout=(self.connect_timeout, read_timeout or self.read_timeout),
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    async def apost_json(self, path, payload, read_timeout=None):
+        """Async POST for asyncio callers; falls back to the sync pool in a worker thread"""
+        if not AIOHTTP_AVAILABLE:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: self.post_json(path, payload, read_timeout))
+
+        session = self._get_async_session()
+        timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=read_timeout or self.read_timeout)
+        async with session.post(self.url(path), json=payload, timeout=timeout) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    def _get_async_session(self):
+        """aiohttp sessions are bound to their event loop, so keep one per loop"""
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host_limit)
+            session = aiohttp.ClientSession(connector=connector)
+            self._async_sessions[loop] = session
+        return session
+
+    async def aclose(self):
+        """Close the aiohttp session of the running event loop"""
+        session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    def close(self):
+        """Close the pooled sync connections"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+def normalize_prompt(text):
+    """Collapse whitespace so trivially different prompts share cache and flight keys"""
+    return " ".join((text or "").split())
+
+# ============ RESPONSE CACHE ============
+class ResponseCache:
+    """
+    Two-tier cache for provider responses: in-memory LRU in front of an
+    optional size-bounded disk tier that survives restarts
+    Entries are namespaced per provider and expire after a TTL
+    """
+    def __init__(self, max_entries=512, ttl=3600, disk_dir="", disk_max_bytes=50 * 1024 * 1024, max_temperature=0.7, enabled=True):
+        self.enabled = bool(enabled)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_max_bytes)
+        self.max_temperature = float(max_temperature)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+        if self.disk_dir:
+            Path(self.disk_dir).mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(f.stat().st_size for f in Path(self.disk_dir).rglob("*.json"))
+            logger.info(f"💾 Response cache disk tier: {self.disk_dir} ({self._disk_bytes / 1024:.1f} KB)")
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a cache from ConfigManager keys"""
+        return cls(
+            max_entries=config.get("response_cache_size", 512),
+            ttl=config.get("response_cache_ttl", 3600),
+            disk_dir=config.get("response_cache_dir", ""),
+            disk_max_bytes=float(config.get("response_cache_disk_max_mb", 50)) * 1024 * 1024,
+            max_temperature=config.get("response_cache_max_temperature", 0.7),
+            enabled=config.get("response_cache_enabled", True),
+        )
+
+    @staticmethod
+    def make_key(provider, model, temperature, context, message):
+        """Stable key for a (provider, model, temperature, context, message) tuple"""
+        raw = json.dumps([provider, model, round(float(temperature or 0), 3), normalize_prompt(context), normalize_prompt(message)], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def should_bypass(self, temperature, bypass=False):
+        """Skip the cache when asked to, or when sampling is too random to reuse answers"""
+        if not self.enabled or bypass or float(temperature or 0) > self.max_temperature:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return True
+        return False
+
+    def get(self, namespace, key):
+        """Return a cached response or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get((namespace, key))
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end((namespace, key))
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[(namespace, key)]
+
+        entry = self._disk_get(namespace, key, now)
+        with self._lock:
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+        self._memory_set(namespace, key, entry["response"], entry["expires_at"])
+        return entry["response"]
+
+    def set(self, namespace, key, value):
+        """Store a response in both tiers"""
+        expires_at = time.time() + self.ttl
+        self._memory_set(namespace, key, value, expires_at)
+        self._disk_set(namespace, key, value, expires_at)
+        with self._lock:
+            self.counters["stores"] += 1
+
+    NAMESPACE = re.compile(r"[A-Za-z0-9_-]+")
+
+    def clear(self, namespace=None):
+        """Drop every entry, or only those of one provider namespace"""
+        if namespace is not None and not (isinstance(namespace, str) and self.NAMESPACE.fullmatch(namespace)):
+            raise ValueError(f"Invalid cache namespace: {namespace!r}")
+        with self._lock:
+            for cache_key in [k for k in self._memory if namespace is None or k[0] == namespace]:
+                del self._memory[cache_key]
+        if self.disk_dir:
+            with self._disk_lock:
+                base = Path(self.disk_dir).resolve()
+                root = (base / namespace).resolve() if namespace else base
+                if root != base and base not in root.parents:
+                    raise ValueError(f"Invalid cache namespace: {namespace!r}")
+                for f in root.rglob("*.json"):
+                    self._disk_bytes -= f.stat().st_size
+                    f.unlink()
+
+    def stats(self):
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": entries,
+            "disk_bytes": self._disk_bytes if self.disk_dir else 0,
+            "enabled": self.enabled,
+        }
+
+    def _memory_set(self, namespace, key, value, expires_at):
+        with self._lock:
+            self._memory[(namespace, key)] = (expires_at, value)
+            self._memory.move_to_end((namespace, key))
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def _disk_path(self, namespace, key):
+        return Path(self.disk_dir) / namespace / f"{key}.json"
+
+    def _disk_get(self, namespace, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(namespace, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) <= now:
+            with self._disk_lock:
+                try:
+                    self._disk_bytes -= path.stat().st_size
+                    path.unlink()
+                except OSError:
+                    pass
+            return None
+        try:
+            os.utime(path)  # mtime doubles as LRU order for disk eviction
+        except OSError:
+            return None  # evicted by another thread after the read
+        return entry
+
+    def _disk_set(self, namespace, key, value, expires_at):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(namespace, key)
+        data = json.dumps({"expires_at": expires_at, "response": value}, ensure_ascii=False).encode("utf-8")
+        try:
+            with self._disk_lock:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                previous = path.stat().st_size if path.exists() else 0
+                tmp_path = path.with_suffix(".tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._disk_bytes += len(data) - previous
+                if self._disk_bytes > self.disk_max_bytes:
+                    self._evict_disk()
+        except OSError as e:
+            logger.warning(f"⚠️ Response cache disk write failed: {e}")
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk tier fits its budget"""
+        files = sorted(Path(self.disk_dir).rglob("*.json"), key=lambda f: f.stat().st_mtime)
+        for f in files:
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            self._disk_bytes -= f.stat().st_size
+            f.unlink()
+            self.counters["evictions"] += 1
+
+# ============ REQUEST COALESCING ============
+class _FlightCall:
+    """In-flight provider call shared by a leader and its waiters"""
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: the first caller (leader) runs the
+    function, duplicates block on its result and share its outcome or error
+    """
+    def __init__(self, timeout=60, enabled=True):
+        self.timeout = float(timeout)
+        self.enabled = bool(enabled)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"leaders": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from ConfigManager keys"""
+        return cls(timeout=config.get("coalesce_timeout", 60), enabled=config.get("coalesce_enabled", True))
+
+    def do(self, key, fn, timeout=None):
+        """Run fn once per key at a time and hand its result to every concurrent caller"""
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _FlightCall()
+                self._calls[key] = call
+                self.counters["leaders"] += 1
+            else:
+                call.waiters += 1
+                self.counters["coalesced"] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    self.counters["errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.event.set()
+
+        if not call.event.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise TimeoutError(f"Timed out waiting for in-flight call {key[:12]}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """Coalescing counters and current in-flight keys"""
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._calls), "enabled": self.enabled}
+
+# ============ CIRCUIT BREAKERS ============
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker
+    Opens when the failure rate (slow calls count as failures) over the recent
+    window crosses a threshold, skips the provider while open, then lets a few
+    half-open probes through to decide whether to close again
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, window=20, slow_call_seconds=0.0, open_seconds=30.0, half_open_probes=1):
+        self.name = name
+        self.failure_rate = float(failure_rate)
+        self.min_calls = max(1, int(min_calls))
+        self.slow_call_seconds = float(slow_call_seconds)
+        self.open_seconds = float(open_seconds)
+        self.half_open_probes = max(1, int(half_open_probes))
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=max(self.min_calls, int(window)))
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.counters = {"opened": 0, "rejected": 0}
+
+    @classmethod
+    def from_config(cls, name, config):
+        """Build a breaker from ConfigManager keys"""
+        return cls(
+            name,
+            failure_rate=config.get("breaker_failure_rate", 0.5),
+            min_calls=config.get("breaker_min_calls", 5),
+            window=config.get("breaker_window", 20),
+            slow_call_seconds=config.get("breaker_slow_call_seconds", 0.0),
+            open_seconds=config.get("breaker_open_seconds", 30.0),
+            half_open_probes=config.get("breaker_half_open_probes", 1),
+        )
+
+    def allow(self):
+        """Whether a call may go to the provider right now"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+                logger.info(f"🟡 Circuit half-open: {self.name}")
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def cancel(self):
+        """Give back an allowed call that never reached the provider (shed, or abandoned by the client)"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, success, latency):
+        """Record the outcome of an allowed call"""
+        ok = bool(success) and not (0 < self.slow_call_seconds < latency)
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok:
+                    self._trip()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self.state = self.CLOSED
+                        self._outcomes.clear()
+                        logger.info(f"🟢 Circuit closed: {self.name}")
+                return
+
+            self._outcomes.append(ok)
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._trip()
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.counters["opened"] += 1
+        logger.warning(f"🔴 Circuit open: {self.name} (skipping for {self.open_seconds}s)")
+
+    def snapshot(self):
+        """Breaker state for /ai/providers"""
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)) if self.state == self.OPEN else 0.0
+            return {
+                "state": self.state,
+                "recent_calls": calls,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "retry_in_seconds": round(retry_in, 1),
+                **self.counters,
+            }
+
+# ============ CONCURRENCY LIMITS ============
+class ProviderOverloaded(Exception):
+    """A provider's wait queue is full (or the wait ran out); retry after retry_after seconds"""
+    def __init__(self, provider, retry_after, reason="queue_full"):
+        super().__init__(f"Provider {provider} is overloaded ({reason})")
+        self.provider = provider
+        self.retry_after = retry_after
+        self.reason = reason
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight calls to one provider; extra callers wait in a bounded queue
+    for at most max_wait seconds and are shed with ProviderOverloaded beyond that
+    """
+    def __init__(self, name, max_concurrent=8, max_queue=32, max_wait=5.0):
+        self.name = name
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = max(0.0, float(max_wait))
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._service_total = 0.0
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "completed": 0, "skipped": 0}
+
+    @classmethod
+    def from_config(cls, name, config):
+        """Per-provider overrides (e.g. ollama_max_concurrency) win over the shared defaults"""
+        setting = lambda key, default: config.get(f"{name}_{key}", config.get(f"provider_{key}", default))
+        return cls(
+            name,
+            max_concurrent=setting("max_concurrency", 8),
+            max_queue=setting("max_queue", 32),
+            max_wait=setting("max_queue_wait", 5.0),
+        )
+
+    def acquire(self, blocking=True):
+        """
+        Take a slot, waiting in the queue if needed; returns seconds spent waiting
+        Non-blocking callers (background work) are refused at once when no slot is free
+        """
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                return self._admit(0.0)
+            if not blocking:
+                self.counters["skipped"] += 1
+                raise ProviderOverloaded(self.name, self.retry_after(), "busy")
+            if self.waiting >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise ProviderOverloaded(self.name, self.retry_after(), "queue_full")
+
+            self.counters["queued"] += 1
+            self.waiting += 1
+            started = time.monotonic()
+            deadline = started + self.max_wait
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["timed_out"] += 1
+                        raise ProviderOverloaded(self.name, self.retry_after(), "queue_timeout")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            return self._admit(time.monotonic() - started)
+
+    def _admit(self, waited):
+        self.active += 1
+        self.counters["admitted"] += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        return waited
+
+    def release(self, service_seconds=0.0):
+        with self._cond:
+            self.active -= 1
+            self.counters["completed"] += 1
+            self._service_total += service_seconds
+            self._cond.notify()
+
+    def call(self, fn):
+        """Run fn() inside a slot"""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            self.release(time.monotonic() - started)
+
+    def retry_after(self):
+        """Seconds until the current queue is likely drained (at least 1)"""
+        completed = self.counters["completed"]
+        avg_service = self._service_total / completed if completed else 1.0
+        return max(1, math.ceil(avg_service * (self.waiting + 1) / self.max_concurrent))
+
+    def stats(self):
+        """Queue depth, in-flight calls and wait times"""
+        with self._cond:
+            admitted = self.counters["admitted"]
+            return {
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "max_wait_seconds": self.max_wait,
+                **self.counters,
+                "avg_wait_ms": round(self._wait_total / admitted * 1000, 1) if admitted else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 1),
+            }
+
+# ============ TIMEOUTS & RETRIES ============
+RETRYABLE_STATUS = {408, 425, 429}
+
+def error_status(error):
+    """HTTP status carried by a provider exception (requests, aiohttp or openai), or None"""
+    status = getattr(error, "http_status", None) or getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error):
+    """Idempotent failures worth another attempt: connection errors, timeouts, 429 and 5xx"""
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if REQUESTS_AVAILABLE and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    # openai error classes, matched by name so the library is not imported here
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "Timeout", "RateLimitError", "ServiceUnavailableError", "TryAgain")
+
+class AdaptiveTimeout:
+    """
+    Per-provider timeout from recent successful latencies: the configured
+    percentile times multiplier, clamped to [min_timeout, max_timeout].
+    max_timeout applies until min_samples calls have completed
+    """
+    def __init__(self, name, percentile=0.99, multiplier=2.0, min_timeout=2.0, max_timeout=60.0, min_samples=20, window=200):
+        self.name = name
+        self.percentile = min(1.0, max(0.0, float(percentile)))
+        self.multiplier = float(multiplier)
+        self.min_timeout = float(min_timeout)
+        self.max_timeout = max(self.min_timeout, float(max_timeout))
+        self.min_samples = max(1, int(min_samples))
+        self._latencies = deque(maxlen=max(self.min_samples, int(window)))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, name, config):
+        """The provider's own read timeout (e.g. ollama_read_timeout) caps the adaptive value"""
+        return cls(
+            name,
+            percentile=config.get("adaptive_timeout_percentile", 0.99),
+            multiplier=config.get("adaptive_timeout_multiplier", 2.0),
+            min_timeout=config.get("adaptive_timeout_min", 2.0),
+            max_timeout=config.get(f"{name}_read_timeout", config.get("adaptive_timeout_max", 60.0)),
+            min_samples=config.get("adaptive_timeout_min_samples", 20),
+        )
+
+    def record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def latency_percentile(self, q):
+        """Latency at quantile q of the recent window (None without samples)"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def current(self):
+        """Timeout for the next attempt, in seconds"""
+        with self._lock:
+            warmed_up = len(self._latencies) >= self.min_samples
+        if not warmed_up:
+            return self.max_timeout
+        adaptive = self.latency_percentile(self.percentile) * self.multiplier
+        return min(self.max_timeout, max(self.min_timeout, adaptive))
+
+    def snapshot(self):
+        p50 = self.latency_percentile(0.5)
+        p99 = self.latency_percentile(0.99)
+        return {
+            "timeout_seconds": round(self.current(), 3),
+            "samples": len(self._latencies),
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p99_seconds": round(p99, 3) if p99 is not None else None,
+        }
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter inside an overall deadline"""
+    def __init__(self, max_attempts=3, base_delay=0.2, max_delay=2.0, deadline=45.0):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        self.deadline = float(deadline)
+        self.counters = {"calls": 0, "retries": 0, "exhausted": 0, "deadline_exceeded": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_attempts=config.get("retry_max_attempts", 3),
+            base_delay=config.get("retry_base_delay", 0.2),
+            max_delay=config.get("retry_max_delay", 2.0),
+            deadline=config.get("provider_request_deadline", 45.0),
+        )
+
+    def run(self, name, fn, timeouts):
+        """Call fn(timeout) until it succeeds, fails for good, or the deadline leaves no room"""
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = min(timeouts.current(), max(0.1, deadline - time.monotonic()))
+            started = time.monotonic()
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt >= self.max_attempts:
+                    self.counters["exhausted"] += 1
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if time.monotonic() + delay + timeouts.min_timeout > deadline:
+                    self.counters["deadline_exceeded"] += 1
+                    raise
+                self.counters["retries"] += 1
+                logger.warning(f"🔁 {name} attempt {attempt} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            timeouts.record(time.monotonic() - started)
+            return result
+
+# ============ LOCAL INFERENCE WORKER ============
+class BatchInferenceWorker:
+    """
+    Dedicated thread that owns a transformers pipeline (which is not thread-safe)
+    Concurrent prompts are collected into micro-batches of up to max_batch_size,
+    waiting at most max_wait_ms for stragglers, and generated in a single call
+    """
+    _STOP = object()
+
+    def __init__(self, pipe, max_batch_size=8, max_wait_ms=10, generate_kwargs=None, name="huggingface"):
+        self.pipe = pipe
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.generate_kwargs = generate_kwargs or {}
+        self.name = name
+        self._queue = queue.Queue()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.counters = {"batches": 0, "prompts": 0, "exclusive_jobs": 0, "errors": 0}
+        self._prepare_tokenizer()
+        self._thread = threading.Thread(target=self._run, name=f"{name}-inference", daemon=True)
+        self._thread.start()
+        logger.info(f"🧵 {name} inference worker started (batch {self.max_batch_size}, wait {max_wait_ms}ms)")
+
+    def _prepare_tokenizer(self):
+        """Decoder-only tokenizers (gpt2 & co) need a pad token and left padding to batch"""
+        tokenizer = getattr(self.pipe, "tokenizer", None)
+        if tokenizer is None:
+            return
+        if tokenizer.pad_token_id is None and tokenizer.eos_token is not None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+
+    def submit(self, prompt, timeout=None):
+        """Queue a prompt and block until its batch has been generated"""
+        future = self._track(Future())
+        self._queue.put((prompt, future))
+        return future.result(timeout)
+
+    def run_exclusive(self, fn):
+        """Run fn(pipe) on the worker thread between batches (e.g. streaming generation)"""
+        future = self._track(Future())
+        self._queue.put((fn, future))
+        return future
+
+    def _track(self, future):
+        with self._in_flight_lock:
+            self._in_flight += 1
+
+        def done(_):
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+        future.add_done_callback(done)
+        return future
+
+    @property
+    def busy(self):
+        """Whether other work is queued or running, so a new prompt could join a batch"""
+        return self._in_flight > 0
+
+    def close(self):
+        """Stop the worker after the queued prompts are served"""
+        self._queue.put(self._STOP)
+
+    def stats(self):
+        """Batching counters and current queue depth"""
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "avg_batch_size": round(self.counters["prompts"] / batches, 2) if batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+            "in_flight": self._in_flight,
+        }
+
+    def _run(self):
+        pending = None
+        while True:
+            item = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is self._STOP:
+                break
+            if callable(item[0]):
+                self._run_exclusive(*item)
+                continue
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP or callable(item[0]):
+                    # Not batchable: handle it right after this batch
+                    pending = item
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            outputs = self.pipe(prompts, batch_size=len(prompts), **self.generate_kwargs)
+        except Exception as e:
+            self.counters["errors"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.counters["batches"] += 1
+        self.counters["prompts"] += len(prompts)
+        for (_, future), output in zip(batch, outputs):
+            # The pipeline returns one list of candidates per prompt
+            candidate = output[0] if isinstance(output, list) else output
+            future.set_result(candidate["generated_text"])
+
+    def _run_exclusive(self, fn, future):
+        self.counters["exclusive_jobs"] += 1
+        try:
+            future.set_result(fn(self.pipe))
+        except Exception as e:
+            self.counters["errors"] += 1
+            future.set_exception(e)
+
+class PrefixKVCache:
+    """
+    Attention state (past_key_values) of prompt prefixes shared across requests,
+    such as the CHRONEX persona, so the local model only encodes what follows.
+    Entries are evicted least-recently-used to stay under memory_budget_mb
+    """
+    def __init__(self, memory_budget_mb=256, cache_sessions=True, enabled=True):
+        self.enabled = bool(enabled)
+        self.budget_bytes = int(float(memory_budget_mb) * 1024 * 1024)
+        self.cache_sessions = bool(cache_sessions)
+        self.prefixes = set()
+        self._entries = OrderedDict()  # prefix text -> (prefix input_ids, past_key_values, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "errors": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            memory_budget_mb=config.get("prefix_cache_memory_mb", 256),
+            cache_sessions=config.get("prefix_cache_sessions", True),
+            enabled=config.get("prefix_cache_enabled", True),
+        )
+
+    def register(self, prefix):
+        """Declare a constant prompt prefix (e.g. a persona block) worth caching"""
+        if prefix:
+            self.prefixes.add(prefix)
+
+    def match(self, prompt, session_prefix=None):
+        """Longest cacheable prefix the prompt starts with, or None"""
+        if not self.enabled:
+            return None
+        candidates = [prefix for prefix in self.prefixes if prompt.startswith(prefix)]
+        if self.cache_sessions and session_prefix and prompt.startswith(session_prefix):
+            candidates.append(session_prefix)
+        return max(candidates, key=len) if candidates else None
+
+    def generate(self, pipe, prefix, suffix, streamer=None, **generate_kwargs):
+        """Generate a continuation of prefix + suffix, encoding only the suffix when prefix is cached"""
+        torch = importlib.import_module("torch")
+        model, tokenizer = pipe.model, pipe.tokenizer
+
+        prefix_ids, past = self._get_or_encode(model, tokenizer, prefix, torch)
+        suffix_ids = tokenizer(suffix, return_tensors="pt", add_special_tokens=False).input_ids
+        input_ids = torch.cat([prefix_ids, suffix_ids], dim=-1)
+        with torch.no_grad():
+            output = model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                # generate() extends the cache in place, so each request gets its own copy
+                past_key_values=copy.deepcopy(past),
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=streamer,
+                **generate_kwargs,
+            )
+        return tokenizer.decode(output[0][input_ids.shape[-1]:], skip_special_tokens=True)
+
+    def _get_or_encode(self, model, tokenizer, prefix, torch):
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is not None:
+                self._entries.move_to_end(prefix)
+                self.counters["hits"] += 1
+                return entry[0], entry[1]
+            self.counters["misses"] += 1
+
+        prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids
+        with torch.no_grad():
+            past = model(prefix_ids, use_cache=True).past_key_values
+        nbytes = self._nbytes(past)
+
+        with self._lock:
+            if prefix not in self._entries and nbytes <= self.budget_bytes:
+                self._entries[prefix] = (prefix_ids, past, nbytes)
+                self._bytes += nbytes
+                while self._bytes > self.budget_bytes:
+                    _, (_, _, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+                    self.counters["evictions"] += 1
+        return prefix_ids, past
+
+    @staticmethod
+    def _nbytes(past):
+        """Memory held by a past_key_values structure (legacy tuples or a Cache object)"""
+        if hasattr(past, "to_legacy_cache"):
+            past = past.to_legacy_cache()
+        total = 0
+        stack = [past]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, (tuple, list)):
+                stack.extend(item)
+            elif hasattr(item, "element_size"):
+                total += item.numel() * item.element_size()
+        return total
+
+    def stats(self):
+        """Hit/miss counters and memory in use"""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "enabled": self.enabled,
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "registered_prefixes": len(self.prefixes),
+                "memory_mb": round(self._bytes / (1024 * 1024), 2),
+                "memory_budget_mb": round(self.budget_bytes / (1024 * 1024), 2),
+            }
+
+# ============ OPENAI KEY POOL ============
+def parse_reset_duration(value):
+    """OpenAI reset headers ("1s", "6m0s", "20ms", "1h2m3.5s") or plain seconds, in seconds"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", text)
+    return sum(float(amount) * units[unit] for amount, unit in parts) if parts else None
+
+class ApiKeyState:
+    """Rate-limit view of one OpenAI key, updated from x-ratelimit-* response headers"""
+    def __init__(self, key, organization=None, model=None):
+        self.key = key
+        self.organization = organization or None
+        self.model = model or None
+        self.limits = {"requests": None, "tokens": None}
+        self.remaining = {"requests": None, "tokens": None}
+        self.reset_at = {"requests": 0.0, "tokens": 0.0}
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.counters = {"requests": 0, "rate_limited": 0, "errors": 0}
+
+    def headroom(self, now):
+        """Fraction of the tighter limit still available (1.0 when unknown or after reset)"""
+        ratios = []
+        for kind in ("requests", "tokens"):
+            limit, remaining = self.limits[kind], self.remaining[kind]
+            if limit and remaining is not None and now < self.reset_at[kind]:
+                ratios.append(remaining / limit)
+        return min(ratios) if ratios else 1.0
+
+    def snapshot(self, now):
+        return {
+            "key": f"...{self.key[-4:]}" if self.key else "",
+            "organization": self.organization,
+            "model": self.model,
+            "headroom": round(self.headroom(now), 3),
+            "remaining": dict(self.remaining),
+            "cooling_down_seconds": round(max(0.0, self.cooldown_until - now), 1),
+            "in_flight": self.in_flight,
+            **self.counters,
+        }
+
+class OpenAIKeyPool:
+    """
+    Pool of OpenAI keys (optionally with their own organization and model)
+    Each request goes to the key with the most rate-limit headroom, ties broken
+    by fewest in-flight requests; a key that gets a 429 cools down until its reset
+    """
+    def __init__(self, entries, cooldown=20.0, base_url=""):
+        self.keys = [ApiKeyState(*entry) for entry in entries if entry and entry[0]]
+        self.cooldown = float(cooldown)
+        self.base_url = base_url or None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        entries = []
+        for item in str(config.get("openai_api_keys") or "").split(","):
+            parts = [part.strip() for part in item.split("|")]
+            if parts[0]:
+                entries.append((parts + [None, None])[:3])
+        if not entries and config.get("openai_api_key"):
+            entries.append((config["openai_api_key"], None, None))
+        return cls(entries, cooldown=config.get("openai_key_cooldown", 20.0), base_url=config.get("openai_api_base", ""))
+
+    def acquire(self):
+        """Lease the key with the most headroom; raises ProviderOverloaded while every key cools down"""
+        now = time.monotonic()
+        with self._lock:
+            ready = [state for state in self.keys if state.cooldown_until <= now]
+            if not ready:
+                if not self.keys:
+                    raise RuntimeError("No OpenAI API key configured")
+                retry_after = max(1, math.ceil(min(state.cooldown_until for state in self.keys) - now))
+                raise ProviderOverloaded("openai", retry_after, "rate_limited")
+            state = max(ready, key=lambda s: (s.headroom(now), -s.in_flight))
+            state.in_flight += 1
+            state.counters["requests"] += 1
+            return state
+
+    def release(self, state, headers=None, error=None):
+        """Return a lease, learning from the response headers or the error"""
+        now = time.monotonic()
+        headers = headers or getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+        with self._lock:
+            state.in_flight -= 1
+            self._update_limits(state, headers, now)
+            if error is None:
+                return
+            if error_status(error) == 429 or type(error).__name__ == "RateLimitError":
+                state.counters["rate_limited"] += 1
+                wait = parse_reset_duration(headers.get("retry-after")) or self._reset_wait(headers) or self.cooldown
+                state.cooldown_until = now + wait
+                logger.warning(f"🧊 OpenAI key ...{state.key[-4:]} rate limited, cooling down {wait:.1f}s")
+            else:
+                state.counters["errors"] += 1
+
+    @staticmethod
+    def _reset_wait(headers):
+        waits = [parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}")) for kind in ("requests", "tokens")]
+        waits = [wait for wait in waits if wait]
+        return max(waits) if waits else None
+
+    @staticmethod
+    def _update_limits(state, headers, now):
+        for kind in ("requests", "tokens"):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            try:
+                if limit is not None:
+                    state.limits[kind] = int(limit)
+                if remaining is not None:
+                    state.remaining[kind] = int(remaining)
+            except ValueError:
+                continue
+            if reset is not None:
+                state.reset_at[kind] = now + reset
+            elif remaining is not None:
+                state.reset_at[kind] = now + 60.0  # limits are per minute
+
+    def client(self, state):
+        """Per-key client for openai>=1 (the SDK's own retries are off; RetryPolicy handles them)"""
+        with self._lock:
+            client = self._clients.get(state.key)
+            if client is None:
+                client = openai.OpenAI(api_key=state.key, organization=state.organization, base_url=self.base_url, max_retries=0)
+                self._clients[state.key] = client
+            return client
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [state.snapshot(now) for state in self.keys]
+
+# ============ MODEL CASCADE ============
+class ModelCascade:
+    """
+    Routes a message to a provider/model tier by complexity and intent, so short
+    messages stay on cheap local models; a weak answer escalates one tier up
+    """
+    TIERS = ("simple", "intermediate", "advanced")
+    LOW_CONFIDENCE = re.compile(
+        r"\b(i don't know|i do not know|i'm not sure|i am not sure|i cannot help|i can't help|as an ai language model)\b",
+        re.IGNORECASE,
+    )
+
+    def __init__(self, routes, upgrade_intents=(), escalate=True, min_answer_chars=20, enabled=True):
+        self.routes = routes
+        self.upgrade_intents = set(upgrade_intents)
+        self.escalate = bool(escalate)
+        self.min_answer_chars = int(min_answer_chars)
+        self.enabled = bool(enabled) and bool(routes)
+        self._lock = threading.Lock()
+        self.counters = {**{f"routed_{tier}": 0 for tier in self.TIERS}, "escalations": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            cls.parse_routes(config.get("cascade_routes", "")),
+            upgrade_intents=[i.strip() for i in str(config.get("cascade_upgrade_intents", "")).split(",") if i.strip()],
+            escalate=config.get("cascade_escalate", True),
+            min_answer_chars=config.get("cascade_min_answer_chars", 20),
+            enabled=config.get("cascade_enabled", False),
+        )
+
+    @classmethod
+    def parse_routes(cls, spec):
+        """"simple=ollama@phi3;advanced=openai@gpt-4o" -> {"simple": [("ollama", "phi3")], ...}"""
+        routes = {}
+        for entry in str(spec or "").split(";"):
+            tier, _, providers = entry.partition("=")
+            tier = tier.strip()
+            if tier not in cls.TIERS:
+                continue
+            route = []
+            for item in providers.split(","):
+                provider, _, model = item.strip().partition("@")
+                if provider and provider != "default":
+                    route.append((provider, model or None))
+            if route:
+                routes[tier] = route
+        return routes
+
+    def providers(self):
+        """Every provider a route can reach (they all need setting up)"""
+        return [provider for route in self.routes.values() for provider, _ in route]
+
+    def tier_for(self, complexity, intents=()):
+        """Complexity label, raised to intermediate for intents the small tier should not answer"""
+        tier = complexity if complexity in self.TIERS else "intermediate"
+        if tier == "simple" and self.upgrade_intents.intersection(intents or ()):
+            tier = "intermediate"
+        return tier
+
+    def plan(self, complexity, intents=()):
+        """(tier, route) pairs to try in order: the routed tier, then the ones above it"""
+        start = self.TIERS.index(self.tier_for(complexity, intents))
+        tiers = [tier for tier in self.TIERS[start:] if tier in self.routes]
+        if not tiers:
+            # Nothing configured at or above this tier: use the highest configured one
+            tiers = [tier for tier in self.TIERS if tier in self.routes][-1:]
+        with self._lock:
+            self.counters[f"routed_{tiers[0]}"] += 1
+        if not self.escalate:
+            tiers = tiers[:1]
+        return [(tier, self.routes[tier]) for tier in tiers]
+
+    def is_weak(self, answer):
+        """Empty, too short, or hedging answers are worth escalating"""
+        text = (answer or "").strip()
+        return len(text) < self.min_answer_chars or bool(self.LOW_CONFIDENCE.search(text[:300]))
+
+    def record_escalation(self):
+        with self._lock:
+            self.counters["escalations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "routes": {tier: [f"{p}@{m}" if m else p for p, m in route] for tier, route in self.routes.items()},
+                **self.counters,
+            }
+
+# ============ METRICS ============
+class Histogram:
+    """Cumulative-bucket histogram per label value, following the Prometheus model"""
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # label -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, label, value):
+        counts = self.series.setdefault(label, [0] * (len(self.buckets) + 1) + [0.0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[len(self.buckets)] += 1
+        counts[-1] += value
+
+class ProviderMetrics:
+    """
+    Per-provider latency, time-to-first-token, token and error telemetry,
+    rendered in the Prometheus text exposition format for /ai/metrics
+    """
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+    TTFT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = Histogram(self.LATENCY_BUCKETS)
+        self.ttft = Histogram(self.TTFT_BUCKETS)
+        self.calls = {}  # (provider, outcome) -> count
+        self.tokens = {}  # (provider, kind) -> count
+        self.errors = {}  # (provider, kind) -> count
+        self.responses = {}  # (ai_powered, fallback_reason) -> count
+
+    @staticmethod
+    def _bump(table, key, amount=1):
+        table[key] = table.get(key, 0) + amount
+
+    def observe_call(self, provider, seconds, success):
+        """One provider call (cache hits and coalesced waiters are not calls)"""
+        with self._lock:
+            self.latency.observe(provider, seconds)
+            self._bump(self.calls, (provider, "success" if success else "empty"))
+
+    def observe_ttft(self, provider, seconds):
+        with self._lock:
+            self.ttft.observe(provider, seconds)
+
+    def record_tokens(self, provider, prompt=None, completion=None):
+        with self._lock:
+            if prompt:
+                self._bump(self.tokens, (provider, "prompt"), int(prompt))
+            if completion:
+                self._bump(self.tokens, (provider, "completion"), int(completion))
+
+    def record_error(self, provider, error):
+        with self._lock:
+            self._bump(self.errors, (provider, self.classify_error(error)))
+
+    def record_response(self, ai_powered, fallback_reason=None):
+        """How a chat turn was answered: by a provider, or locally and why"""
+        with self._lock:
+            self._bump(self.responses, ("true" if ai_powered else "false", fallback_reason or "none"))
+
+    @staticmethod
+    def classify_error(error):
+        """timeout, rate_limited, server, client, connection or other"""
+        name = type(error).__name__
+        if isinstance(error, (TimeoutError, FutureTimeoutError)) or "Timeout" in name:
+            return "timeout"
+        if REQUESTS_AVAILABLE and isinstance(error, requests.Timeout):
+            return "timeout"
+        status = error_status(error)
+        if status == 429 or name == "RateLimitError":
+            return "rate_limited"
+        if status is not None:
+            return "server" if status >= 500 else "client"
+        if isinstance(error, ConnectionError) or name == "APIConnectionError":
+            return "connection"
+        if REQUESTS_AVAILABLE and isinstance(error, requests.ConnectionError):
+            return "connection"
+        return "other"
+
+    def render(self, snapshots=()):
+        """Prometheus text format; snapshots are (name, type, help, [(labels, value), ...]) read at scrape time"""
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        def histogram(name, help_text, hist):
+            samples = []
+            for provider, counts in sorted(hist.series.items()):
+                for bound, count in zip(hist.buckets, counts):
+                    samples.append(({"provider": provider, "le": bound}, count))
+                samples.append(({"provider": provider, "le": "+Inf"}, counts[len(hist.buckets)]))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, value in samples:
+                lines.append(f'{name}_bucket{{provider="{labels["provider"]}",le="{labels["le"]}"}} {value}')
+            for provider, counts in sorted(hist.series.items()):
+                lines.append(f'{name}_sum{{provider="{provider}"}} {round(counts[-1], 6)}')
+                lines.append(f'{name}_count{{provider="{provider}"}} {counts[len(hist.buckets)]}')
+
+        with self._lock:
+            histogram("chronex_provider_request_duration_seconds", "Provider call latency", self.latency)
+            histogram("chronex_provider_time_to_first_token_seconds", "Streaming time to first token", self.ttft)
+            family("chronex_provider_calls_total", "counter", "Provider calls by outcome",
+                   [({"provider": p, "outcome": o}, n) for (p, o), n in sorted(self.calls.items())])
+            family("chronex_provider_tokens_total", "counter", "Prompt and completion tokens",
+                   [({"provider": p, "kind": k}, n) for (p, k), n in sorted(self.tokens.items())])
+            family("chronex_provider_errors_total", "counter", "Provider errors by kind (timeouts included)",
+                   [({"provider": p, "kind": k}, n) for (p, k), n in sorted(self.errors.items())])
+            family("chronex_chat_responses_total", "counter", "Chat answers by source and fallback reason",
+                   [({"ai_powered": a, "fallback_reason": r}, n) for (a, r), n in sorted(self.responses.items())])
+        for name, kind, help_text, samples in snapshots:
+            family(name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
 # ============ REAL AI PROVIDERS ============
 class RealAIProvider:
     """Handles real AI responses from various providers"""
@@ -219,73 +1651,706 @@ class RealAIProvider:
     def __init__(self, config):
         self.config = config
         self.provider = config.get("ai_provider", "openai")
-        self.setup_provider()
+        self.chain = self._parse_chain(config)
+        self.cascade = ModelCascade.from_config(config)
+        # Failover chain plus every provider the cascade can route to
+        self.providers = list(dict.fromkeys(self.chain + (self.cascade.providers() if self.cascade.enabled else [])))
+        self.breakers = {name: CircuitBreaker.from_config(name, config) for name in self.providers}
+        self.limiters = {name: ConcurrencyLimiter.from_config(name, config) for name in self.providers}
+        self.metrics = ProviderMetrics()
+        self.timeouts = {name: AdaptiveTimeout.from_config(name, config) for name in ("openai", "ollama")}
+        self.retry_policies = {name: RetryPolicy.from_config(config) for name in ("openai", "ollama")}
+        self.ollama_transport = ProviderTransport.from_config(config)
+        self.response_cache = ResponseCache.from_config(config)
+        self.single_flight = SingleFlight.from_config(config)
+        self.inference_worker = None
+        self.openai_keys = OpenAIKeyPool.from_config(config)
+        self._ollama_last_used = 0.0
+        self._ollama_pinger = None
+        self.prefix_cache = PrefixKVCache.from_config(config)
+        self.hf_backend = config.get("huggingface_backend", "pytorch")
+        self.hf_context_window = 1024
+        self.hf_tokenizer = None  # request-thread copy; fast tokenizers are not thread-safe
+        self._hf_tokenizer_lock = threading.Lock()
+        self.hf_max_new_tokens = int(config.get("max_tokens", 1000))
+        self.start_warmup()
     
-    def setup_provider(self):
-        """Setup the AI provider"""
-        if self.provider == "openai" and OPENAI_AVAILABLE:
-            openai.api_key = self.config.get("openai_api_key", "")
-            logger.info("✅ OpenAI provider initialized")
-        elif self.provider == "huggingface" and HUGGINGFACE_AVAILABLE:
-            self.pipe = pipeline("text-generation", model=self.config.get("huggingface_model", "gpt2"))
-            logger.info("✅ Hugging Face provider initialized")
+    def start_warmup(self):
+        """Load the configured provider in the background so startup is not blocked"""
+        self.state = "warming"
+        self.warmup_error = None
+        self.setup_failures = {}
+        self.warmup_seconds = None
+        if self.config.get("background_warmup", True):
+            threading.Thread(target=self._warm_up, name="provider-warmup", daemon=True).start()
         else:
+            self._warm_up()
+
+    def _warm_up(self):
+        started = time.monotonic()
+        try:
+            self.setup_failures = self.setup_provider()
+            self._update_state()
+        except Exception as e:
+            self.state = "failed"
+            self.warmup_error = str(e)
+            logger.error(f"❌ Provider warm-up failed: {e}")
+        self.warmup_seconds = round(time.monotonic() - started, 3)
+        logger.info(f"🔥 Provider warm-up finished: {self.state} in {self.warmup_seconds}s")
+
+    def _update_state(self):
+        """Some providers up is degraded service; none up is a failed warm-up"""
+        failed = self.setup_failures
+        if self.providers and len(failed) == len(self.providers):
+            self.state = "failed"
+        else:
+            self.state = "degraded" if failed else "ready"
+        self.warmup_error = "; ".join(f"{name}: {error}" for name, error in failed.items()) or None
+
+    def _provider_recovered(self, name):
+        """A provider that failed warm-up came up later (e.g. Ollama started after us)"""
+        if self.state == "warming" or self.setup_failures.pop(name, None) is None:
+            return
+        self._update_state()
+        logger.info(f"✅ Provider {name} recovered, service now {self.state}")
+
+    @property
+    def is_ready(self):
+        """True once the configured provider has finished loading"""
+        return self.state in ("ready", "degraded")
+
+    def readiness(self):
+        """Warm-up state for health endpoints"""
+        return {
+            "state": self.state,
+            "provider": self.provider,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.warmup_error,
+        }
+
+    @staticmethod
+    def _parse_chain(config):
+        """Ordered provider failover chain (ai_provider is prepended when missing)"""
+        chain = config.get("provider_chain") or []
+        if isinstance(chain, str):
+            chain = [name.strip() for name in chain.split(",") if name.strip()]
+        primary = config.get("ai_provider", "openai")
+        if primary not in chain:
+            chain = [primary] + list(chain)
+        return [name for name in chain if name != "default"]
+
+    def setup_provider(self):
+        """Setup every provider in the failover chain and the cascade routes; returns {provider: error} for those that did not come up"""
+        if not self.providers:
             logger.warning("⚠️ No real AI provider available, using default responses")
+        failed = {}
+        for name in self.providers:
+            try:
+                if not self._setup_one(name):
+                    failed[name] = "not available"
+            except Exception as e:
+                logger.error(f"❌ Could not initialize provider {name}: {e}")
+                failed[name] = str(e)
+        if self.providers and len(failed) == len(self.providers):
+            logger.error(f"❌ No provider could be initialized ({'; '.join(f'{n}: {e}' for n, e in failed.items())})")
+        return failed
+
+    def _setup_one(self, provider):
+        """Setup a single AI provider"""
+        if provider == "openai" and OPENAI_AVAILABLE:
+            # The module-level key still serves the vision endpoints; chat goes through the key pool
+            openai.api_key = self.openai_keys.keys[0].key if self.openai_keys.keys else self.config.get("openai_api_key", "")
+            if self.config.get("openai_api_base"):
+                openai.api_base = self.config["openai_api_base"]
+            logger.info(f"✅ OpenAI provider initialized ({len(self.openai_keys.keys)} API key(s))")
+        elif provider == "ollama":
+            # The pinger keeps retrying the preload, so a late Ollama still recovers
+            self._start_ollama_pinger()
+            if self.config.get("ollama_preload", True) and not self.preload_ollama():
+                raise RuntimeError(f"Ollama unreachable at {self.ollama_transport.base_url}")
+            logger.info(f"✅ Ollama provider initialized ({self.ollama_transport.base_url}, model {self.config.get('ollama_model', 'llama3')})")
+        elif provider == "huggingface" and HUGGINGFACE_AVAILABLE:
+            self.pipe = self._build_hf_pipeline()
+            self._set_hf_limits()
+            self.hf_tokenizer = self._request_tokenizer()
+            if self.config.get("hf_batch_enabled", True):
+                self.inference_worker = BatchInferenceWorker(
+                    self.pipe,
+                    max_batch_size=self.config.get("hf_max_batch_size", 8),
+                    max_wait_ms=self.config.get("hf_max_batch_wait_ms", 10),
+                    generate_kwargs={"max_new_tokens": self.hf_max_new_tokens, "return_full_text": False},
+                )
+            logger.info(f"✅ Hugging Face provider initialized ({self.hf_backend} backend)")
+        else:
+            logger.warning(f"⚠️ Provider {provider} not available, skipping it")
+            return False
+        return True
+
+    def _build_hf_pipeline(self):
+        """Text-generation pipeline for huggingface_model on the configured CPU backend"""
+        model_name = self.config.get("huggingface_model", "gpt2")
+        backend = self.config.get("huggingface_backend", "pytorch")
+        threads = int(self.config.get("inference_threads", 0) or 0)
+        if threads > 0 and TORCH_AVAILABLE:
+            importlib.import_module("torch").set_num_threads(threads)
+
+        if backend == "onnx" and not ONNX_AVAILABLE:
+            logger.warning("⚠️ optimum/onnxruntime not installed, using the pytorch backend")
+            backend = "pytorch"
+        elif backend == "int8" and not TORCH_AVAILABLE:
+            logger.warning("⚠️ torch not installed, using the pytorch backend")
+            backend = "pytorch"
+        self.hf_backend = backend
+
+        if backend == "onnx":
+            onnxruntime = importlib.import_module("onnxruntime")
+            ort_models = importlib.import_module("optimum.onnxruntime")
+            options = onnxruntime.SessionOptions()
+            if threads > 0:
+                options.intra_op_num_threads = threads
+                options.inter_op_num_threads = 1
+            model_path = self.config.get("onnx_model_path") or model_name
+            model = ort_models.ORTModelForCausalLM.from_pretrained(
+                model_path,
+                export=not self.config.get("onnx_model_path"),
+                provider="CPUExecutionProvider",
+                session_options=options,
+            )
+            tokenizer = transformers.AutoTokenizer.from_pretrained(model_path)
+            return transformers.pipeline("text-generation", model=model, tokenizer=tokenizer)
+
+        if backend == "int8":
+            torch = importlib.import_module("torch")
+            model = transformers.AutoModelForCausalLM.from_pretrained(model_name)
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+            return transformers.pipeline("text-generation", model=model, tokenizer=tokenizer)
+
+        return transformers.pipeline("text-generation", model=model_name)
+
+    def prometheus_metrics(self):
+        """Telemetry plus current cache, breaker and queue state in Prometheus text format"""
+        cache = self.response_cache.stats()
+        flights = self.single_flight.stats()
+        breaker_states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+        limiters = {name: limiter.stats() for name, limiter in self.limiters.items()}
+        snapshots = [
+            ("chronex_response_cache_lookups_total", "counter", "Response cache lookups by result",
+             [({"result": "memory_hit"}, cache["memory_hits"]), ({"result": "disk_hit"}, cache["disk_hits"]),
+              ({"result": "miss"}, cache["misses"]), ({"result": "bypass"}, cache["bypassed"])]),
+            ("chronex_response_cache_hit_ratio", "gauge", "Response cache hit ratio", [({}, cache["hit_rate"])]),
+            ("chronex_coalesced_requests_total", "counter", "Requests served by another identical in-flight call",
+             [({}, flights["coalesced"])]),
+            ("chronex_circuit_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+             [({"provider": name}, breaker_states[b.snapshot()["state"]]) for name, b in self.breakers.items()]),
+            ("chronex_provider_in_flight", "gauge", "Provider calls in progress",
+             [({"provider": name}, stats["active"]) for name, stats in limiters.items()]),
+            ("chronex_provider_queue_depth", "gauge", "Provider calls waiting for a slot",
+             [({"provider": name}, stats["queue_depth"]) for name, stats in limiters.items()]),
+            ("chronex_provider_timeout_seconds", "gauge", "Current adaptive timeout",
+             [({"provider": name}, round(t.current(), 3)) for name, t in self.timeouts.items()]),
+        ]
+        return self.metrics.render(snapshots)
+
+    def provider_available(self, provider):
+        """Whether a provider's library is installed and it finished setting up"""
+        if provider == "openai":
+            return OPENAI_AVAILABLE
+        if provider == "huggingface":
+            return HUGGINGFACE_AVAILABLE and hasattr(self, "pipe")
+        return provider == "ollama"
     
-    def generate_response(self, message, context=""):
-        """Generate real AI response"""
+    def generate_response(self, message, context="", bypass_cache=False, route=None, background=False):
+        """
+        Generate real AI response (route: [(provider, model)] to use instead of the failover chain)
+        background=True never waits for a provider slot, so it cannot delay user requests
+        """
         try:
             if not self.config.get("use_real_ai", True):
                 return None
-            
-            if self.provider == "openai" and OPENAI_AVAILABLE:
-                return self.openai_response(message, context)
-            elif self.provider == "huggingface" and HUGGINGFACE_AVAILABLE:
-                return self.huggingface_response(message)
-            elif self.provider == "ollama":
-                return self.ollama_response(message)
-            else:
+            if not self.is_ready:
+                logger.info(f"⏳ Provider {self.state}, using default response")
                 return None
+            
+            overloaded = []
+            attempted = 0
+            for provider, model in route or [(name, None) for name in self.chain]:
+                if not self.provider_available(provider):
+                    continue
+                attempted += 1
+                try:
+                    response = self._cached_call(provider, message, context, bypass_cache, model, background)
+                except ProviderOverloaded as e:
+                    logger.warning(f"🚦 {e}, trying next in chain")
+                    overloaded.append(e)
+                    continue
+                except Exception as e:
+                    logger.error(f"❌ AI Provider error ({provider}): {e}")
+                    response = None
+                if response:
+                    return response
+                logger.info(f"↪️ Provider {provider} gave no answer, trying next in chain")
+            if overloaded and len(overloaded) == attempted:
+                # Every provider is shedding load: let the caller answer 503 instead of queueing
+                raise min(overloaded, key=lambda e: e.retry_after)
+            return None
+        except ProviderOverloaded:
+            raise
         except Exception as e:
             logger.error(f"❌ AI Provider error: {e}")
             return None
+
+    def _provider_model(self, provider):
+        """Model name a provider is configured with (part of the cache key)"""
+        if provider == "huggingface":
+            return f"{self.config.get('huggingface_model', '')}@{self.hf_backend}"
+        return self.config.get(f"{provider}_model", "")
+
+    def _cached_call(self, provider, message, context="", bypass_cache=False, model=None, background=False):
+        """Serve from the response cache, or call the provider once for all identical in-flight requests"""
+        temperature = self.config.get("temperature", 0.7)
+        key = self.response_cache.make_key(provider, model or self._provider_model(provider), temperature, context, message)
+        use_cache = not self.response_cache.should_bypass(temperature, bypass_cache)
+
+        if use_cache:
+            cached = self.response_cache.get(provider, key)
+            if cached is not None:
+                logger.info(f"⚡ Response cache hit ({provider})")
+                return cached
+
+        def call():
+            breaker = self.breakers[provider]
+            if not breaker.allow():
+                logger.info(f"⏭️ Circuit open for {provider}, skipping")
+                return None
+            limiter = self.limiters[provider]
+            try:
+                limiter.acquire(blocking=not background)
+            except ProviderOverloaded:
+                breaker.cancel()  # a shed half-open probe must not hold the breaker open
+                raise
+            started = time.monotonic()
+            response = None
+            shed = False
+            try:
+                response = self._invoke_provider(provider, message, context, model)
+            except ProviderOverloaded:
+                shed = True  # e.g. every OpenAI key cooling down: not a provider failure
+                raise
+            finally:
+                elapsed = time.monotonic() - started
+                limiter.release(elapsed)
+                if shed:
+                    breaker.cancel()
+                else:
+                    breaker.record(bool(response), elapsed)
+                    self.metrics.observe_call(provider, elapsed, bool(response))
+            if response and use_cache:
+                self.response_cache.set(provider, key, response)
+            return response
+
+        return self.single_flight.do(f"{provider}:{key}", call)
+
+    def _invoke_provider(self, provider, message, context="", model=None):
+        """Dispatch to a provider implementation (model overrides the configured one)"""
+        if provider == "openai" and OPENAI_AVAILABLE:
+            return self.openai_response(message, context, model)
+        elif provider == "huggingface" and HUGGINGFACE_AVAILABLE:
+            return self.huggingface_response(message, context)  # one loaded pipeline
+        elif provider == "ollama":
+            return self.ollama_response(message, context, model)
+        else:
+            return None
     
-    def openai_response(self, message, context=""):
+    def _with_retries(self, provider, fn):
+        """Run fn(timeout) under the provider's adaptive timeout and retry policy"""
+        def attempt(timeout):
+            try:
+                return fn(timeout)
+            except ProviderOverloaded:
+                raise
+            except Exception as e:
+                self.metrics.record_error(provider, e)
+                raise
+        return self.retry_policies[provider].run(provider, attempt, self.timeouts[provider])
+
+    def openai_response(self, message, context="", model=None):
         """Get response from OpenAI API"""
         try:
-            response = openai.ChatCompletion.create(
-                model=self.config.get("openai_model", "gpt-3.5-turbo"),
-                messages=[
-                    {"role": "system", "content": f"You are Chronex AI, an advanced assistant. Context: {context}"},
-                    {"role": "user", "content": message}
-                ],
-                temperature=self.config.get("temperature", 0.7),
-                max_tokens=self.config.get("max_tokens", 1000)
-            )
-            return response.choices[0].message.content
+            return self._with_retries("openai", lambda timeout: self._openai_request(message, context, timeout, model))
+        except ProviderOverloaded:
+            raise  # every key is cooling down
         except Exception as e:
             logger.error(f"OpenAI error: {e}")
             return None
+
+    def _openai_messages(self, message, context=""):
+        return [
+            {"role": "system", "content": f"You are Chronex AI, an advanced assistant. Context: {context}"},
+            {"role": "user", "content": message}
+        ]
+
+    def _openai_request(self, message, context, timeout, model=None):
+        lease = self.openai_keys.acquire()
+        headers = error = None
+        try:
+            request = dict(
+                model=model or lease.model or self.config.get("openai_model", "gpt-3.5-turbo"),
+                messages=self._openai_messages(message, context),
+                temperature=self.config.get("temperature", 0.7),
+                max_tokens=self.config.get("max_tokens", 1000),
+            )
+            if hasattr(openai, "OpenAI"):
+                # openai>=1: the raw response exposes the x-ratelimit-* headers
+                raw = self.openai_keys.client(lease).chat.completions.with_raw_response.create(timeout=timeout, **request)
+                headers = raw.headers
+                response = raw.parse()
+            else:
+                response = openai.ChatCompletion.create(
+                    api_key=lease.key, organization=lease.organization, request_timeout=timeout, **request
+                )
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.openai_keys.release(lease, headers=headers, error=error)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.metrics.record_tokens("openai", usage.prompt_tokens, usage.completion_tokens)
+        return response.choices[0].message.content
     
-    def huggingface_response(self, message):
+    @staticmethod
+    def _local_prompt(message, context=""):
+        """Single prompt for local models: persona/history context followed by the user turn"""
+        if not context:
+            return message
+        return f"{context}\n\nUser: {message}\nCHRONEX AI:"
+
+    def _set_hf_limits(self):
+        """Context window of the loaded model; generated tokens get at most half of it"""
+        model_config = getattr(getattr(self.pipe, "model", None), "config", None)
+        window = getattr(model_config, "max_position_embeddings", None) or getattr(model_config, "n_positions", None)
+        if not window:
+            window = getattr(self.pipe.tokenizer, "model_max_length", 0)
+            window = window if 0 < window < 1_000_000 else 1024  # tokenizers without a limit report a huge sentinel
+        self.hf_context_window = int(window)
+        self.hf_max_new_tokens = max(1, min(int(self.config.get("max_tokens", 1000)), self.hf_context_window // 2))
+
+    def _request_tokenizer(self):
+        """
+        Private copy of the pipeline's tokenizer for request threads. The
+        pipeline's own instance belongs to the inference worker, which tokenizes
+        batches concurrently ("Already borrowed" otherwise)
+        """
+        try:
+            return copy.deepcopy(self.pipe.tokenizer)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not copy the Hugging Face tokenizer, prompts will not be fitted: {e}")
+            return None
+
+    def _fit_local_prompt(self, prompt):
+        """Keep the newest part of the prompt so it plus max_new_tokens fits the context window"""
+        if self.hf_tokenizer is None:
+            return prompt
+        budget = self.hf_context_window - self.hf_max_new_tokens
+        with self._hf_tokenizer_lock:
+            ids = self.hf_tokenizer.encode(prompt)
+            if len(ids) <= budget:
+                return prompt
+            fitted = self.hf_tokenizer.decode(ids[-budget:], skip_special_tokens=True)
+        logger.info(f"✂️ Local prompt trimmed from {len(ids)} to {budget} tokens")
+        return fitted
+
+    def _cached_prefix(self, prompt, context=""):
+        """Prefix of the prompt whose attention state can be reused, if any"""
+        if self.hf_backend == "onnx":
+            return None  # ORT sessions manage their own past_key_values
+        session_prefix = context.split(HISTORY_MARKER, 1)[0] if HISTORY_MARKER in context else None
+        return self.prefix_cache.match(prompt, session_prefix)
+
+    def _prefix_generate(self, prefix, prompt, streamer=None):
+        """Run a prefix-cached generation on the pipeline's owner thread"""
+        generate = lambda pipe: self.prefix_cache.generate(
+            pipe, prefix, prompt[len(prefix):], streamer=streamer,
+            max_new_tokens=self.hf_max_new_tokens,
+        )
+        if self.inference_worker is not None:
+            # Prompts with different cached prefixes do not batch; they run between batches
+            return self.inference_worker.run_exclusive(generate)
+        return generate(self.pipe)
+
+    def huggingface_response(self, message, context=""):
         """Get response from Hugging Face model"""
         try:
-            result = self.pipe(message, max_length=self.config.get("max_tokens", 1000))
-            return result[0]['generated_text']
+            prompt = self._fit_local_prompt(self._local_prompt(message, context))
+            text = self._huggingface_generate(prompt, context)
+            self._record_local_tokens(prompt, text)
+            return text
         except Exception as e:
             logger.error(f"Hugging Face error: {e}")
+            self.metrics.record_error("huggingface", e)
             return None
+
+    def _huggingface_generate(self, prompt, context=""):
+        # Under concurrent load micro-batching beats prefix reuse, which runs one prompt at a time
+        worker = self.inference_worker
+        prefix = None if worker is not None and worker.busy else self._cached_prefix(prompt, context)
+        if prefix:
+            try:
+                result = self._prefix_generate(prefix, prompt)
+                if isinstance(result, Future):
+                    result = result.result(self.config.get("hf_request_timeout", 120))
+                return result
+            except Exception as e:
+                self.prefix_cache.counters["errors"] += 1
+                logger.warning(f"⚠️ Prefix cache generation failed, encoding the full prompt: {e}")
+        if self.inference_worker is not None:
+            return self.inference_worker.submit(prompt, timeout=self.config.get("hf_request_timeout", 120))
+        result = self.pipe(prompt, max_new_tokens=self.hf_max_new_tokens, return_full_text=False)
+        return result[0]['generated_text']
+
+    def _record_local_tokens(self, prompt, text):
+        """Token usage of a local generation, counted with the request-thread copy of the model's tokenizer"""
+        if self.hf_tokenizer is None or not text:
+            return
+        try:
+            with self._hf_tokenizer_lock:
+                prompt_tokens, completion_tokens = len(self.hf_tokenizer.encode(prompt)), len(self.hf_tokenizer.encode(text))
+            self.metrics.record_tokens("huggingface", prompt_tokens, completion_tokens)
+        except Exception as e:
+            logger.debug(f"Token count failed: {e}")
     
-    def ollama_response(self, message):
+    def _ollama_payload(self, prompt, stream, model=None, context=""):
+        """Generate request naming the model and how long Ollama should keep it loaded"""
+        self._ollama_last_used = time.monotonic()
+        payload = {
+            "model": model or self.config.get("ollama_model", "llama3"),
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self._ollama_keep_alive(),
+        }
+        if context:
+            # Persona, summary and recent turns go in the system prompt; the model's template wraps the user turn
+            payload["system"] = context
+        return payload
+
+    def _ollama_keep_alive(self):
+        """Ollama takes durations ("30m") or seconds (-1 = never unload)"""
+        keep_alive = str(self.config.get("ollama_keep_alive", "30m")).strip()
+        return int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+
+    def preload_ollama(self):
+        """Load the model into memory (a generate call without prompt) so no user pays the cold start"""
+        started = time.monotonic()
+        try:
+            self.ollama_transport.post_json("/api/generate", {
+                "model": self.config.get("ollama_model", "llama3"),
+                "keep_alive": self._ollama_keep_alive(),
+            })
+            self._ollama_last_used = time.monotonic()
+            logger.info(f"🦙 Ollama model {self.config.get('ollama_model', 'llama3')} resident ({time.monotonic() - started:.1f}s)")
+            self._provider_recovered("ollama")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Ollama preload failed: {e}")
+            return False
+
+    def _start_ollama_pinger(self):
+        """Re-send the keep-alive when the model has been idle for ollama_ping_interval seconds"""
+        interval = float(self.config.get("ollama_ping_interval", 240) or 0)
+        if interval <= 0 or self._ollama_pinger is not None:
+            return
+
+        def ping_loop():
+            while True:
+                time.sleep(interval)
+                if time.monotonic() - self._ollama_last_used >= interval:
+                    self.preload_ollama()
+
+        self._ollama_pinger = threading.Thread(target=ping_loop, name="ollama-keepalive", daemon=True)
+        self._ollama_pinger.start()
+
+    def ollama_residency(self):
+        """Whether the configured model is loaded in Ollama right now (from /api/ps)"""
+        model = self.config.get("ollama_model", "llama3")
+        try:
+            loaded = self.ollama_transport.get_json("/api/ps", read_timeout=2).get("models", [])
+        except Exception as e:
+            return {"model": model, "resident": None, "error": str(e)}
+        wanted = model if ":" in model else f"{model}:latest"
+        entry = next((m for m in loaded if m.get("name") in (model, wanted) or m.get("model") in (model, wanted)), None)
+        return {
+            "model": model,
+            "resident": entry is not None,
+            "expires_at": entry.get("expires_at") if entry else None,
+            "size_vram": entry.get("size_vram") if entry else None,
+            "keep_alive": self._ollama_keep_alive(),
+            "loaded_models": [m.get("name") for m in loaded],
+        }
+
+    def ollama_response(self, message, context="", model=None):
         """Get response from Ollama (local model)"""
         try:
-            import requests
-            response = requests.post(
-                f"{self.config.get('ollama_endpoint')}/api/generate",
-                json={"prompt": message, "stream": False},
-                timeout=30
+            result = self._with_retries("ollama", lambda timeout: self.ollama_transport.post_json(
+                "/api/generate", self._ollama_payload(message, stream=False, model=model, context=context), read_timeout=timeout
+            ))
+            self.metrics.record_tokens("ollama", result.get("prompt_eval_count"), result.get("eval_count"))
+            return result.get("response")
+        except Exception as e:
+            logger.error(f"Ollama error: {e}")
+            return None
+
+    def stream_response(self, message, context="", route=None):
+        """Yield response text chunks as the provider produces them (nothing if unavailable)"""
+        if not self.config.get("use_real_ai", True) or not self.is_ready:
+            return
+        streams = {
+            "openai": lambda model: self.openai_stream(message, context, model),
+            "huggingface": lambda model: self.huggingface_stream(message, context),
+            "ollama": lambda model: self.ollama_stream(message, context, model),
+        }
+        for provider, model in route or [(name, None) for name in self.chain]:
+            if provider not in streams or not self.provider_available(provider):
+                continue
+            breaker = self.breakers[provider]
+            if not breaker.allow():
+                continue
+            limiter = self.limiters[provider]
+            try:
+                limiter.acquire()
+            except ProviderOverloaded as e:
+                breaker.cancel()
+                logger.warning(f"🚦 {e}, trying next in chain")
+                continue
+            started = time.monotonic()
+            produced = False
+            outcome = None  # stays None when the call is shed or the client goes away
+            try:
+                for token in streams[provider](model):
+                    if not produced:
+                        self.metrics.observe_ttft(provider, time.monotonic() - started)
+                    produced = True
+                    yield token
+                outcome = produced
+            except ProviderOverloaded as e:
+                logger.warning(f"🚦 {e}, trying next in chain")
+                continue
+            except Exception as e:
+                logger.error(f"❌ AI Provider stream error ({provider}): {e}")
+                self.metrics.record_error(provider, e)
+                outcome = False
+                if produced:
+                    return  # cannot switch providers mid-answer
+                continue
+            finally:
+                elapsed = time.monotonic() - started
+                limiter.release(elapsed)
+                if outcome is None:
+                    breaker.cancel()
+                else:
+                    breaker.record(outcome, elapsed)
+            self.metrics.observe_call(provider, time.monotonic() - started, produced)
+            if produced:
+                return
+
+    def openai_stream(self, message, context="", model=None):
+        """Stream response deltas from OpenAI API"""
+        lease = self.openai_keys.acquire()
+        headers = error = None
+        produced = 0
+        try:
+            request = dict(
+                model=model or lease.model or self.config.get("openai_model", "gpt-3.5-turbo"),
+                messages=self._openai_messages(message, context),
+                temperature=self.config.get("temperature", 0.7),
+                max_tokens=self.config.get("max_tokens", 1000),
+                stream=True,
             )
-            return response.json().get("response")
+            if hasattr(openai, "OpenAI"):
+                raw = self.openai_keys.client(lease).chat.completions.with_raw_response.create(**request)
+                headers = raw.headers
+                tokens = (chunk.choices[0].delta.content for chunk in raw.parse() if chunk.choices)
+            else:
+                chunks = openai.ChatCompletion.create(api_key=lease.key, organization=lease.organization, **request)
+                tokens = (chunk["choices"][0]["delta"].get("content") for chunk in chunks)
+            for token in tokens:
+                if token:
+                    produced += 1  # one content delta per token
+                    yield token
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also runs when the client disconnects mid-stream
+            self.openai_keys.release(lease, headers=headers, error=error)
+        self.metrics.record_tokens("openai", completion=produced)
+
+    def huggingface_stream(self, message, context=""):
+        """Stream generated text from the Hugging Face pipeline"""
+        from transformers import TextIteratorStreamer
+
+        prompt = self._fit_local_prompt(self._local_prompt(message, context))
+        prefix = self._cached_prefix(prompt, context)
+        # The timeout turns a stalled generation into an error instead of a request that never ends
+        streamer = TextIteratorStreamer(
+            self.pipe.tokenizer, skip_prompt=True, skip_special_tokens=True,
+            timeout=self.config.get("hf_request_timeout", 120),
+        )
+        if prefix:
+            run = lambda pipe: self.prefix_cache.generate(
+                pipe, prefix, prompt[len(prefix):], streamer=streamer,
+                max_new_tokens=self.hf_max_new_tokens,
+            )
+        else:
+            run = lambda pipe: pipe(prompt, max_new_tokens=self.hf_max_new_tokens, streamer=streamer)
+        errors = []
+
+        def generate(pipe):
+            try:
+                return run(pipe)
+            except BaseException as e:
+                errors.append(e)
+                raise
+            finally:
+                streamer.end()  # a failed generate must still stop the consumer below
+
+        if self.inference_worker is not None:
+            # Keep the pipeline on its owner thread; streaming runs between batches
+            job = self.inference_worker.run_exclusive(generate)
+        else:
+            job = threading.Thread(target=generate, args=(self.pipe,), daemon=True)
+            job.start()
+        tokens = []
+        for token in streamer:
+            if token:
+                tokens.append(token)
+                yield token
+        if isinstance(job, Future):
+            job.result()
+        else:
+            job.join()
+            if errors:
+                raise errors[0]
+        self._record_local_tokens(prompt, "".join(tokens))
+
+    def ollama_stream(self, message, context="", model=None):
+        """Stream tokens from Ollama (local model)"""
+        for event in self.ollama_transport.stream_json_lines("/api/generate", self._ollama_payload(message, stream=True, model=model, context=context)):
+            if event.get("error"):
+                raise RuntimeError(event["error"])
+            token = event.get("response")
+            if token:
+                yield token
+            if event.get("done"):
+                self.metrics.record_tokens("ollama", event.get("prompt_eval_count"), event.get("eval_count"))
+                break
+
+    async def ollama_response_async(self, message, context=""):
+        """Get response from Ollama without blocking the event loop"""
+        try:
+            result = await self.ollama_transport.apost_json("/api/generate", self._ollama_payload(message, stream=False, context=context))
+            self.metrics.record_tokens("ollama", result.get("prompt_eval_count"), result.get("eval_count"))
+            return result.get("response")
         except Exception as e:
             logger.error(f"Ollama error: {e}")
             return None
@@ -300,6 +2365,10 @@ def def_random(response_list):
         return "I'm here to help! What would you like to know?"
     return random.choice(response_list)
 
+def sse_event(event, data):
+    """Format a Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # ============ CREATOR LIBRARY STORAGE ============
 class CreatorLibrary:
     """
@@ -449,11 +2518,572 @@ CHRONEX_CONFIG = {
     }
 }
 
+# ============ CONTEXT WINDOW ============
+class TokenCounter:
+    """
+    Offline token counter with a per-text count cache
+    Uses the locally cached Hugging Face tokenizer when available, otherwise a
+    GPT-style regex estimate (words, numbers, punctuation runs, long words split)
+    The tokenizer loads in the background on first use, so importing
+    transformers never delays startup; counts use the regex until it is ready
+    """
+    _PATTERN = re.compile(r"'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]{1,6}| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+|_+")
+
+    def __init__(self, tokenizer="auto", model_name="gpt2", cache_size=4096):
+        self.cache_size = cache_size
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+        self.model_name = model_name
+        self._tokenizer = None
+        self._want_tokenizer = tokenizer == "auto" and HUGGINGFACE_AVAILABLE
+        self._loader = None
+
+    @property
+    def backend(self):
+        return "huggingface" if self._tokenizer is not None else "regex"
+
+    def _ensure_tokenizer(self):
+        """Start loading the tokenizer on first use; returns whatever is available right now"""
+        if self._want_tokenizer and self._loader is None:
+            with self._lock:
+                if self._loader is None:
+                    self._loader = threading.Thread(target=self._load_in_background, name="tokenizer-loader", daemon=True)
+                    self._loader.start()
+        return self._tokenizer
+
+    def _load_in_background(self):
+        tokenizer = self._load_tokenizer(self.model_name)
+        if tokenizer is not None:
+            with self._lock:
+                self._tokenizer = tokenizer
+                self._counts.clear()  # regex estimates would disagree with the real counts
+
+    @staticmethod
+    def _load_tokenizer(model_name):
+        """Only use a tokenizer that is already on disk - never download during a request"""
+        if not HUGGINGFACE_AVAILABLE:
+            return None
+        try:
+            return transformers.AutoTokenizer.from_pretrained(model_name, local_files_only=True)
+        except Exception:
+            return None
+
+    def tokenize(self, text):
+        """Split text into token strings (joined back they give the original text)"""
+        tokenizer = self._ensure_tokenizer()
+        if tokenizer is not None:
+            ids = tokenizer.encode(text, add_special_tokens=False)
+            return [tokenizer.decode([i]) for i in ids]
+        return self._PATTERN.findall(text)
+
+    def count(self, text):
+        """Token count for text, cached by content digest"""
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached is not None:
+                self._counts.move_to_end(key)
+                return cached
+        tokenizer = self._ensure_tokenizer()
+        if tokenizer is not None:
+            n = len(tokenizer.encode(text, add_special_tokens=False))
+        else:
+            n = len(self._PATTERN.findall(text))
+        with self._lock:
+            self._counts[key] = n
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return n
+
+    def truncate(self, text, max_tokens, marker=" …[truncated]"):
+        """Keep the leading tokens of text so the result, marker included, fits max_tokens (deterministic)"""
+        if self.count(text) <= max_tokens:
+            return text
+        keep = max_tokens - self.count(marker)
+        if keep <= 0:
+            return ""
+        return "".join(self.tokenize(text)[:keep]).rstrip() + marker
+
+class ContextWindowBuilder:
+    """Fill a token budget with the newest conversation turns, walking backwards"""
+    MIN_PARTIAL_TOKENS = 16  # below this a truncated turn is more noise than context
+
+    def __init__(self, counter, token_budget=1024, turn_max_tokens=256):
+        self.counter = counter
+        self.token_budget = int(token_budget)
+        self.turn_max_tokens = int(turn_max_tokens)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from ConfigManager keys"""
+        counter = TokenCounter(config.get("context_tokenizer", "auto"), config.get("huggingface_model", "gpt2"))
+        return cls(counter, config.get("context_token_budget", 1024), config.get("context_turn_max_tokens", 256))
+
+    def build(self, conversation_history, token_budget=None):
+        """
+        Return (context_text, turns_included, tokens_used) for the newest turns
+        that fit the budget; oversized turns are cut to turn_max_tokens
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        lines = []
+        used = 0
+        for msg in reversed(conversation_history):
+            line = f"{msg.get('role', 'user')}: {msg.get('content', '')}"
+            tokens = self.counter.count(line)
+            if tokens > self.turn_max_tokens:
+                line = self.counter.truncate(line, self.turn_max_tokens)
+                tokens = self.counter.count(line)
+            remaining = budget - used
+            if tokens > remaining:
+                if remaining >= self.MIN_PARTIAL_TOKENS:
+                    line = self.counter.truncate(line, remaining)
+                    lines.append(line)
+                    used += self.counter.count(line)
+                break
+            lines.append(line)
+            used += tokens
+        lines.reverse()
+        return "\n".join(lines), len(lines), used
+
+class ConversationSummarizer:
+    """
+    Folds turns that fell out of the context window into a running summary
+    stored with the session, so long chats keep their gist in few tokens
+    """
+    SENTENCE_END = re.compile(r"(?<=[.!?])\s|\n")
+
+    def __init__(self, counter, max_tokens=256, use_ai=False, provider=None):
+        self.counter = counter
+        self.max_tokens = int(max_tokens)
+        self.use_ai = bool(use_ai)
+        self.provider = provider
+
+    def fold(self, state, conversation_history, dropped_turns, offset=0):
+        """
+        Add turns summarized..dropped_turns to the session summary (runs in the background)
+        Positions count from the first turn of the session; offset is how many of
+        them the history no longer holds
+        """
+        with state["lock"]:
+            if dropped_turns < state.get("summarized_turns", 0):
+                # The client started over with a shorter history
+                state["summary"] = ""
+                state["summarized_turns"] = 0
+            start = state.get("summarized_turns", 0)
+            turns = conversation_history[max(start - offset, 0):dropped_turns - offset]
+            if not turns:
+                return
+            summary = state.get("summary", "")
+
+        updated = None
+        if self.use_ai and self.provider is not None:
+            updated = self._summarize_with_ai(summary, turns)
+        if not updated:
+            updated = self._summarize_extractive(summary, turns)
+
+        with state["lock"]:
+            # Another fold may have moved on while this one ran
+            if state.get("summarized_turns", 0) == start:
+                state["summary"] = updated
+                state["summarized_turns"] = dropped_turns
+
+    def _summarize_extractive(self, summary, turns):
+        """Keep the first sentence of each folded turn, newest lines win when over budget"""
+        lines = [line for line in summary.split("\n") if line]
+        for msg in turns:
+            content = " ".join(str(msg.get("content", "")).split())
+            first = self.SENTENCE_END.split(content, maxsplit=1)[0]
+            lines.append(f"- {msg.get('role', 'user')}: {self.counter.truncate(first, 40)}")
+        while len(lines) > 1 and self.counter.count("\n".join(lines)) > self.max_tokens:
+            lines.pop(0)
+        return self.counter.truncate("\n".join(lines), self.max_tokens)
+
+    def _summarize_with_ai(self, summary, turns):
+        transcript = "\n".join(f"{msg.get('role', 'user')}: {msg.get('content', '')}" for msg in turns)
+        prompt = f"""Update the running summary of this conversation with the new turns.
+Keep facts, decisions, names and open questions. Answer with the summary only.
+
+Current summary:
+{summary or '(empty)'}
+
+New turns:
+{transcript}"""
+        try:
+            updated = self.provider.generate_response(
+                prompt, "You summarize conversations concisely.", bypass_cache=True, background=True
+            )
+        except ProviderOverloaded:
+            return None  # no free provider slot: fall back to the extractive summary
+        return self.counter.truncate(updated.strip(), self.max_tokens) if updated else None
+
+class Turn:
+    """One stored chat turn: no per-instance dict, an integer timestamp and no analysis"""
+    __slots__ = ("role", "content", "ts")
+
+    def __init__(self, role, content, ts=None):
+        self.role = role
+        self.content = content
+        self.ts = int(time.time()) if ts is None else int(ts)
+
+    def get(self, key, default=None):
+        """Dict-style read, so the context builder and summarizer take turns and client dicts alike"""
+        if key == "timestamp":
+            return datetime.fromtimestamp(self.ts).isoformat()
+        if key in ("role", "content"):
+            return getattr(self, key)
+        return default
+
+    def to_dict(self):
+        return {"role": self.role, "content": self.content, "timestamp": self.get("timestamp")}
+
+class TurnRing:
+    """
+    Fixed-capacity ring buffer of Turns for one session. Once full the oldest
+    turn falls off; evicted counts them so summary positions stay valid
+    """
+    __slots__ = ("_turns", "evicted")
+
+    def __init__(self, capacity=200):
+        self._turns = deque(maxlen=max(2, int(capacity)))
+        self.evicted = 0
+
+    def append(self, turn):
+        """Store a Turn, or a processor's turn dict reduced to role and content"""
+        if not isinstance(turn, Turn):
+            turn = Turn(turn.get("role", "user"), str(turn.get("content", "")))
+        if len(self._turns) == self._turns.maxlen:
+            self.evicted += 1
+        self._turns.append(turn)
+
+    @property
+    def capacity(self):
+        return self._turns.maxlen
+
+    def __len__(self):
+        return len(self._turns)
+
+    def __iter__(self):
+        return iter(self._turns)
+
+    def __reversed__(self):
+        return reversed(self._turns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._turns)[index]
+        return self._turns[index]
+
+    def pop(self):
+        """Remove and return the newest turn"""
+        return self._turns.pop()
+
+    def to_list(self):
+        """JSON-ready turns, built only when a client asks for the history"""
+        return [turn.to_dict() for turn in self._turns]
+
+def turn_dict(turn):
+    return turn.to_dict() if isinstance(turn, Turn) else turn
+
+class SessionStore:
+    """
+    Server-side conversations keyed by session id. Clients of the delta
+    protocol send only the new message and get back only the new turn.
+    Sessions are spread over shards with their own locks so concurrent users
+    rarely contend, and each shard evicts idle and least recently used
+    sessions to keep memory bounded
+    """
+
+    def __init__(self, shards=16, max_sessions=10000, idle_ttl=3600, max_turns=200):
+        self.shard_count = max(1, int(shards))
+        self.max_turns = int(max_turns)
+        self.max_sessions = max(1, int(max_sessions))
+        self.shard_capacity = max(1, math.ceil(self.max_sessions / self.shard_count))
+        self.idle_ttl = float(idle_ttl)
+        self._shards = [{"lock": threading.Lock(), "sessions": OrderedDict()} for _ in range(self.shard_count)]
+        self._counter_lock = threading.Lock()
+        self._sweeper = None
+        self.counters = {"created": 0, "resumed": 0, "reset": 0, "evicted_idle": 0, "evicted_lru": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            shards=config.get("session_shards", 16),
+            max_sessions=config.get("session_max_sessions", 10000),
+            idle_ttl=config.get("session_idle_ttl", 3600),
+            max_turns=config.get("session_max_turns", 200),
+        )
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def _shard(self, session_id):
+        return self._shards[hash(session_id) % self.shard_count]
+
+    def _count(self, name, amount=1):
+        if amount:
+            with self._counter_lock:
+                self.counters[name] += amount
+
+    def _evict(self, sessions, now):
+        """Drop idle sessions, then the least recently used beyond the shard capacity (shard lock held)"""
+        idle = lru = 0
+        if self.idle_ttl > 0:
+            # Sessions stay in last-used order, so idle ones sit at the front
+            while sessions and now - next(iter(sessions.values()))["last_used"] > self.idle_ttl:
+                sessions.popitem(last=False)
+                idle += 1
+        while len(sessions) > self.shard_capacity:
+            sessions.popitem(last=False)
+            lru += 1
+        return idle, lru
+
+    def get(self, session_id, create=True):
+        """Session state (history, running summary); None for an unknown id when create is False"""
+        shard = self._shard(session_id)
+        now = time.time()
+        created = False
+        with shard["lock"]:
+            sessions = shard["sessions"]
+            state = sessions.get(session_id)
+            if state is not None and self.idle_ttl > 0 and now - state["last_used"] > self.idle_ttl:
+                del sessions[session_id]
+                self._count("evicted_idle")
+                state = None
+            if state is not None:
+                sessions.move_to_end(session_id)
+            elif create:
+                state = {
+                    "lock": threading.Lock(),  # summary fields
+                    "turn_lock": threading.Lock(),  # one turn at a time per session
+                    "history": TurnRing(self.max_turns),
+                    "summary": "",
+                    "summarized_turns": 0,
+                }
+                sessions[session_id] = state
+                created = True
+            if state is not None:
+                state["last_used"] = now
+            evicted = self._evict(sessions, now) if created else (0, 0)
+        self._count("created" if created else "resumed", 1 if state is not None else 0)
+        self._count("evicted_idle", evicted[0])
+        self._count("evicted_lru", evicted[1])
+        return state
+
+    def turn_lock(self, session_id):
+        """Lock that serializes turns of one session, so its history is never interleaved"""
+        return self.get(session_id)["turn_lock"]
+
+    def reset(self, session_id):
+        """Forget one session; other sessions are untouched"""
+        shard = self._shard(session_id)
+        with shard["lock"]:
+            removed = shard["sessions"].pop(session_id, None) is not None
+        self._count("reset", 1 if removed else 0)
+        return removed
+
+    def sweep(self):
+        """Evict idle sessions in every shard"""
+        now = time.time()
+        for shard in self._shards:
+            with shard["lock"]:
+                idle, lru = self._evict(shard["sessions"], now)
+            self._count("evicted_idle", idle)
+            self._count("evicted_lru", lru)
+
+    def start_sweeper(self):
+        """Background sweep so idle sessions are freed even when no new ones arrive"""
+        if self.idle_ttl <= 0 or self._sweeper is not None:
+            return
+
+        def sweep_loop():
+            while True:
+                time.sleep(max(1.0, self.idle_ttl / 2))
+                self.sweep()
+
+        self._sweeper = threading.Thread(target=sweep_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self):
+        sessions = turns = 0
+        for shard in self._shards:
+            with shard["lock"]:
+                sessions += len(shard["sessions"])
+                turns += sum(len(state["history"]) for state in shard["sessions"].values())
+        with self._counter_lock:
+            counters = dict(self.counters)
+        return {
+            "sessions": sessions,
+            "turns": turns,
+            "shards": self.shard_count,
+            "max_sessions": self.max_sessions,
+            "max_turns": self.max_turns,
+            "idle_ttl": self.idle_ttl,
+            **counters,
+        }
+
+class FastPathRouter:
+    """
+    Recognises short messages that are purely a greeting, a status check or a
+    creator question, so they can be answered locally without a provider call.
+    Only whole-message matches count, which keeps false positives rare
+    """
+    PATTERNS = {
+        "greeting": re.compile(
+            r"(hi+|hello|hey+|heya|hiya|yo|sup|howdy|hola|greetings|good (morning|afternoon|evening))"
+            r"( there)?( chronex( ai)?)?( bot)?"
+        ),
+        "status": re.compile(
+            r"(are you|r u|you) (online|there|up|alive|working|awake)( chronex( ai)?)?"
+            r"|(system |server )?status( check)?|health ?check|ping"
+        ),
+        "creator": re.compile(
+            r"who (made|created|built|developed|programmed) (you|this|chronex( ai)?)"
+            r"|who (is|are|'s) (your|the) (creator|creators|developer|developers|maker|author)s?"
+            r"|who is demon alex"
+        ),
+    }
+    TRAILING = re.compile(r"[\s!?.,:;~👋🙂😀😊]+$")
+
+    def __init__(self, intents=("greeting", "status", "creator"), max_words=8, enabled=True):
+        self.intents = [intent for intent in intents if intent in self.PATTERNS]
+        self.max_words = int(max_words)
+        self.enabled = bool(enabled)
+        self.counters = {intent: 0 for intent in self.PATTERNS}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            intents=[i.strip() for i in str(config.get("fast_path_intents", "")).split(",") if i.strip()],
+            max_words=config.get("fast_path_max_words", 8),
+            enabled=config.get("fast_path_enabled", True),
+        )
+
+    def match(self, message):
+        """Local intent the whole message expresses, or None"""
+        if not self.enabled or not message:
+            return None
+        text = self.TRAILING.sub("", " ".join(message.lower().split()))
+        if not text or len(text.split()) > self.max_words:
+            return None
+        for intent in self.intents:
+            if self.PATTERNS[intent].fullmatch(text):
+                self.counters[intent] += 1
+                return intent
+        return None
+
+    def stats(self):
+        return {"enabled": self.enabled, "intents": self.intents, "answered": dict(self.counters)}
+
+# Constant persona blocks that open every prompt; the local model caches their attention state
+CHRONEX_PERSONA_PROMPT = """You are CHRONEX AI, the ultimate neural assistant created by DEMON ALEX CREATOR OF CHRONEX AI.
+Your purpose is to provide high-precision technical assistance, advanced problem solving, and insightful analysis.
+Maintain a professional, slightly futuristic, and extremely intelligent persona."""
+
+SIMPLIFIED_PERSONA_PROMPT = """You are CHRONEX AI, the advanced intelligence directive from DEMON ALEX CREATOR OF CHRONEX AI.
+You excel at programming, mathematics, architecture, and tactical analysis.
+Provide detailed, structured, and highly valuable responses."""
+
+# Heading of the recent-turns block; everything before it is stable within a session
+HISTORY_MARKER = "Recent conversation:"
+
+SIMPLIFIED_FALLBACK_RESPONSE = """💭 I'm here to help! Feel free to ask me about:
+- Programming and code help
+- Math and calculations
+- Data science questions  
+- General advice and conversation
+- And much more!
+
+What would you like to discuss?"""
+
 # ============ ENHANCED NLP & INTENT SYSTEM ============
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over casefolded keywords. One pass over the text
+    finds every keyword, so matching cost does not grow with the keyword count.
+    Matches start on a word boundary ("hi" never matches "this"); keywords of
+    three or more letters may end in a common suffix ("bugs", "explaining",
+    "compiled"), shorter ones must be whole words ("go" never matches "going")
+    """
+    SUFFIXES = ("s", "es", "ing", "ed", "ic")
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # (keyword, payload, allowed word endings) ending at each node
+
+    def add(self, keyword, payload, inflect=True):
+        keyword = keyword.casefold().strip()
+        if not keyword:
+            return
+        if inflect and len(keyword) >= 3 and self._is_word(keyword[-1]):
+            self._insert(keyword, payload, frozenset(("",) + self.SUFFIXES))
+            if len(keyword) >= 4 and keyword.endswith("e"):
+                # "compile" -> "compiling", "compiled"
+                self._insert(keyword[:-1], payload, frozenset(("ing", "ed")))
+        else:
+            self._insert(keyword, payload, frozenset(("",)))
+
+    def _insert(self, keyword, payload, endings):
+        node = 0
+        for ch in keyword:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][ch] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append((keyword, payload, endings))
+
+    def build(self):
+        """Compute failure links breadth-first; call once after the last add"""
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, child in self._goto[node].items():
+                pending.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        return self
+
+    @staticmethod
+    def _is_word(ch):
+        return ch.isalnum() or ch == "_"
+
+    def find(self, text):
+        """Payloads of every keyword occurring in text (already casefolded) on word boundaries"""
+        goto, fail, out, is_word = self._goto, self._fail, self._out, self._is_word
+        length = len(text)
+        found = []
+        node = 0
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword, payload, endings in out[node]:
+                start = end - len(keyword)
+                # Edges made of symbols ("c++", "c#") need no boundary
+                if start > 0 and is_word(keyword[0]) and is_word(text[start - 1]):
+                    continue
+                if is_word(keyword[-1]):
+                    stop = end
+                    while stop < length and is_word(text[stop]):
+                        stop += 1
+                    if text[end:stop] not in endings:
+                        continue
+                found.append(payload)
+        return found
+
 class IntentClassifier:
     """Advanced intent classification for smarter AI responses"""
-    
-    def __init__(self):
+    NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+    def __init__(self, knowledge_engine=None):
         self.intents = {
             "greeting": ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening"],
             "question": ["what", "why", "how", "when", "where", "who", "which", "can you", "could you"],
@@ -466,44 +3096,47 @@ class IntentClassifier:
             "sports": ["messi", "ronaldo", "soccer", "football", "basketball", "sport", "game", "player", "athlete", "team", "better"],
             "space": ["sun", "mars", "moon", "star", "planet", "galaxy", "universe", "space", "orbit", "gravity", "black hole", "nasa"],
         }
-        
-    def detect_intent(self, message):
+        self.languages = ["python", "javascript", "java", "c++", "c#", "ruby", "go", "rust", "php", "typescript"]
+        self.topics = ["ai", "machine learning", "data science", "web", "mobile", "database", "api", "cloud"]
+        self.technical_terms = ["algorithm", "optimize", "architecture", "implementation"]
+
+        # Every keyword list, knowledge topics included, goes into one automaton built at startup
+        self.automaton = KeywordAutomaton()
+        for rank, (intent, keywords) in enumerate(self.intents.items()):
+            for keyword in keywords:
+                self.automaton.add(keyword, ("intent", rank, intent))
+        for kind, values in (("language", self.languages), ("topic", self.topics), ("technical", self.technical_terms)):
+            for rank, value in enumerate(values):
+                self.automaton.add(value, (kind, rank, value))
+        if knowledge_engine is not None:
+            for keyword, payload in knowledge_engine.keywords():
+                self.automaton.add(keyword, payload)
+        self.automaton.build()
+
+    def scan(self, message):
+        """All keyword matches of a message from one pass, by kind and in list order"""
+        ranked = {"intent": {}, "language": {}, "topic": {}, "technical": {}, "knowledge": {}}
+        for kind, rank, value in self.automaton.find(message.casefold()):
+            ranked[kind][rank] = value
+        return {kind: [found[rank] for rank in sorted(found)] for kind, found in ranked.items()}
+
+    def scan_batch(self, messages):
+        """scan() for a list of messages"""
+        return [self.scan(message) for message in messages]
+
+    def detect_intent(self, message, matches=None):
         """Detect user's intent from message"""
-        msg_lower = message.lower()
-        detected = []
-        
-        for intent, keywords in self.intents.items():
-            if any(keyword in msg_lower for keyword in keywords):
-                detected.append(intent)
-        
+        detected = (matches or self.scan(message))["intent"]
         return detected if detected else ["general"]
-    
-    def extract_entities(self, message):
+
+    def extract_entities(self, message, matches=None):
         """Extract important entities from message"""
-        entities = {
-            "languages": [],
-            "topics": [],
-            "numbers": []
+        matches = matches or self.scan(message)
+        return {
+            "languages": matches["language"],
+            "topics": matches["topic"],
+            "numbers": self.NUMBER.findall(message)
         }
-        
-        # Programming languages
-        langs = ["python", "javascript", "java", "c++", "c#", "ruby", "go", "rust", "php", "typescript"]
-        for lang in langs:
-            if lang in message.lower():
-                entities["languages"].append(lang)
-        
-        # Topics
-        topics = ["ai", "machine learning", "data science", "web", "mobile", "database", "api", "cloud"]
-        for topic in topics:
-            if topic in message.lower():
-                entities["topics"].append(topic)
-        
-        # Extract numbers (simple regex would be better)
-        import re
-        numbers = re.findall(r'\d+(?:\.\d+)?', message)
-        entities["numbers"] = numbers
-        
-        return entities
 
 # ============ ENHANCED KNOWLEDGE ENGINE ============
 class KnowledgeEngine:
@@ -511,7 +3144,27 @@ class KnowledgeEngine:
     
     def __init__(self):
         self.knowledge_base = self._build_knowledge_base()
-        
+        self.automaton = KeywordAutomaton()
+        for keyword, payload in self.keywords():
+            self.automaton.add(keyword, payload)
+        self.automaton.build()
+
+    ALIASES = {"async": ["asynchronous", "asyncio"]}
+
+    def keywords(self):
+        """(keyword, payload) pairs: every word of every topic name (and its singular) points at that topic"""
+        rank = 0
+        for category, items in self.knowledge_base.items():
+            for topic in items:
+                payload = ("knowledge", rank, (category, topic))
+                for word in topic.split('_'):
+                    yield word, payload
+                    if len(word) > 3 and word.endswith("s"):
+                        yield word[:-1], payload  # "functions" -> "function"
+                for alias in self.ALIASES.get(topic, []):
+                    yield alias, payload
+                rank += 1
+
     def _build_knowledge_base(self):
         """Build comprehensive knowledge base"""
         return {
@@ -549,52 +3202,76 @@ class KnowledgeEngine:
             }
         }
     
-    def search(self, query):
+    def search(self, query, matches=None):
         """Search knowledge base for relevant information"""
-        query_lower = query.lower()
-        results = []
-        
-        for category, items in self.knowledge_base.items():
-            for topic, info in items.items():
-                if topic in query_lower or any(word in query_lower for word in topic.split('_')):
-                    results.append({
-                        "category": category,
-                        "topic": topic,
-                        "information": info
-                    })
-        
-        return results
+        if matches is None:
+            found = {rank: value for _, rank, value in self.automaton.find(query.casefold())}
+            matches = [found[rank] for rank in sorted(found)]
+        else:
+            matches = matches["knowledge"]
+
+        return [
+            {
+                "category": category,
+                "topic": topic,
+                "information": self.knowledge_base[category][topic]
+            }
+            for category, topic in matches
+        ]
 
 # ============ CHRONEX AI CLASS (ENHANCED) ============
 class ChronexAIPython:
     def __init__(self, config_obj=None):
         self.config = config_obj or CHRONEX_CONFIG
-        self.conversation_history = []
-        self.user_context = {}  # Store user-specific context
+        self.sessions = SessionStore.from_config(config_manager.config)  # per-session history and context
+        self.sessions.start_sweeper()
         self.ai_provider = RealAIProvider(config_manager.config)
+        self.ai_provider.prefix_cache.register(CHRONEX_PERSONA_PROMPT)
+        self.ai_provider.prefix_cache.register(SIMPLIFIED_PERSONA_PROMPT)
         self.use_real_ai = config_manager.get("use_real_ai", True)
+        self.executor = ThreadPoolExecutor(max_workers=config_manager.get("chat_workers", 32), thread_name_prefix="chronex-ai")
+        self.summary_executor = ThreadPoolExecutor(max_workers=config_manager.get("summary_workers", 2), thread_name_prefix="chronex-summary")
+        # Batch items wait on provider calls in self.executor, so they need their own threads
+        self.batch_executor = ThreadPoolExecutor(max_workers=config_manager.get("chat_batch_workers", 8), thread_name_prefix="chronex-batch")
+        self.context_builder = ContextWindowBuilder.from_config(config_manager.config)
+        self.fast_path = FastPathRouter.from_config(config_manager.config)
+        try:
+            import psutil
+            psutil.cpu_percent(interval=None)  # start the window check_status reads without blocking
+        except ImportError:
+            pass
+        self.summarizer = ConversationSummarizer(
+            self.context_builder.counter,
+            max_tokens=config_manager.get("summary_max_tokens", 256),
+            use_ai=config_manager.get("summary_use_ai", False),
+            provider=self.ai_provider,
+        )
         
         # Initialize enhanced components
-        self.intent_classifier = IntentClassifier()
         self.knowledge_engine = KnowledgeEngine()
+        self.intent_classifier = IntentClassifier(self.knowledge_engine)
         
         logger.info(f"🧠 ChronexAI Enhanced - Using Real AI: {self.use_real_ai}")
 
     def analyze_message(self, message):
         """Deep analysis of user message"""
+        matches = self.intent_classifier.scan(message)
         analysis = {
-            "intents": self.intent_classifier.detect_intent(message),
-            "entities": self.intent_classifier.extract_entities(message),
-            "complexity": self._assess_complexity(message),
-            "knowledge_matches": self.knowledge_engine.search(message),
+            "intents": self.intent_classifier.detect_intent(message, matches),
+            "entities": self.intent_classifier.extract_entities(message, matches),
+            "complexity": self._assess_complexity(message, matches),
+            "knowledge_matches": self.knowledge_engine.search(message, matches),
         }
         return analysis
+
+    def analyze_messages(self, messages):
+        """analyze_message() for a list of messages"""
+        return [self.analyze_message(message) for message in messages]
     
-    def _assess_complexity(self, message):
+    def _assess_complexity(self, message, matches=None):
         """Assess message complexity"""
         word_count = len(message.split())
-        has_technical = any(word in message.lower() for word in 
-                          ["algorithm", "optimize", "architecture", "implementation"])
+        has_technical = bool((matches or self.intent_classifier.scan(message))["technical"])
         
         if word_count > 50 or has_technical:
             return "advanced"
@@ -615,7 +3292,10 @@ class ChronexAIPython:
                 if analysis['knowledge_matches']:
                     enriched_context += f"\nRelevant Topics: {', '.join([m['topic'] for m in analysis['knowledge_matches'][:3]])}"
             
-            real_response = self.ai_provider.generate_response(message, enriched_context)
+            if self.ai_provider.cascade.enabled:
+                real_response = self._cascade_response(message, enriched_context, analysis)
+            else:
+                real_response = self.ai_provider.generate_response(message, enriched_context)
             if real_response:
                 logger.info(f"✅ Real AI response generated with context")
                 return real_response
@@ -624,6 +3304,169 @@ class ChronexAIPython:
         logger.info(f"⚡ Using intelligent context-aware fallback")
         return None
 
+    def _fast_path_result(self, message, conversation_history, session_id=None):
+        """Answer a purely local intent without a provider; None when the message needs one"""
+        intent = self.fast_path.match(message)
+        if intent is None:
+            return None
+        # The fast path stays in memory: no synchronous rewrite of the creator library per hit
+        handlers = {
+            "greeting": self.handle_greeting,
+            "status": lambda msg: self.check_status(msg, record=False),
+            "creator": lambda msg: self.handle_creator_query(msg, record=False),
+        }
+        response, ai_powered, fallback_reason = self._answered(handlers[intent](message), False, "fast_path")
+        conversation_history.append({
+            "role": "assistant",
+            "content": response,
+            "timestamp": datetime.now().isoformat()
+        })
+        self._schedule_summary(session_id, conversation_history, 0)
+        return {
+            "success": True,
+            "response": response,
+            "model": self.config["model"]["name"],
+            "history": conversation_history,
+            "ai_powered": ai_powered,
+            "fallback_reason": fallback_reason,
+            "fast_path": intent
+        }
+
+    def _cascade_route(self, message, analysis=None):
+        """Cascade plan for a message, using the analysis when the caller already ran it"""
+        if analysis is None:
+            matches = self.intent_classifier.scan(message)
+            analysis = {
+                "complexity": self._assess_complexity(message, matches),
+                "intents": self.intent_classifier.detect_intent(message, matches),
+            }
+        complexity, intents = analysis["complexity"], analysis["intents"]
+        return self.ai_provider.cascade.plan(complexity, intents)
+
+    def _cascade_response(self, message, context, analysis=None):
+        """Answer on the cheapest suitable tier, escalating weak answers one tier at a time"""
+        cascade = self.ai_provider.cascade
+        answer = None
+        overloaded = None
+        for tier, route in self._cascade_route(message, analysis):
+            if answer is not None or overloaded is not None:
+                cascade.record_escalation()
+                logger.info(f"⬆️ Escalating to the {tier} tier")
+            try:
+                candidate = self.ai_provider.generate_response(message, context, route=route)
+            except ProviderOverloaded as e:
+                overloaded = e
+                continue
+            if candidate and not cascade.is_weak(candidate):
+                return candidate
+            # Keep the best weak answer so far: the longest one
+            if candidate and (answer is None or len(candidate.strip()) > len(answer.strip())):
+                answer = candidate
+        if answer is None and overloaded is not None:
+            raise overloaded
+        return answer  # a weak answer still beats the canned one
+
+    def _session_state(self, session_id):
+        """Per-session context (history, running summary) kept in the session store"""
+        return self.sessions.get(session_id)
+
+    def session_history(self, data):
+        """(history, session_id, delta) for a chat body; a body without history uses the server-side session"""
+        session_id = data.get('session_id')
+        if 'history' in data or not (session_id or data.get('delta')):
+            return data.get('history', []), session_id, False
+        session_id = session_id or SessionStore.new_id()
+        return self._session_state(session_id)["history"], session_id, True
+
+    @staticmethod
+    def _discard_user_turn(conversation_history, message):
+        """Take back the user turn of a request that got no answer, so a retry does not store it twice"""
+        last = conversation_history[-1] if conversation_history else None
+        if last is not None and last.get("role") == "user" and last.get("content") == message:
+            conversation_history.pop()
+
+    def session_reply(self, result, session_id, include_history=False):
+        """Trim a processor result to the delta protocol: the new assistant turn instead of the whole history"""
+        result = dict(result)
+        history = result.pop("history", None) or []
+        result["session_id"] = session_id
+        result["turns"] = len(history)
+        if history and history[-1].get("role") == "assistant":
+            # The text is already in "response"; the turn only adds its metadata
+            result["turn"] = {key: value for key, value in turn_dict(history[-1]).items() if key != "content"}
+        if include_history:
+            result["history"] = [turn_dict(turn) for turn in history]
+        return result
+
+    def _history_context(self, conversation_history, session_id=None):
+        """Recent turns within the token budget, preceded by the session's running summary"""
+        recent, included, _ = self.context_builder.build(conversation_history)
+        dropped = len(conversation_history) - included
+        summary = self._session_state(session_id)["summary"] if session_id else ""
+        block = f"{HISTORY_MARKER}\n{recent}"
+        if summary:
+            block = f"Earlier conversation (summary):\n{summary}\n\n{block}"
+        return block, dropped
+
+    def _schedule_summary(self, session_id, conversation_history, dropped):
+        """Fold turns that left the window into the summary after the response is sent"""
+        capacity = getattr(conversation_history, "capacity", None)
+        if capacity:
+            # The next user/assistant pair pushes the oldest turns out of the ring; fold them first
+            dropped = max(dropped, len(conversation_history) + 2 - capacity)
+        if not session_id or dropped <= 0 or not config_manager.get("summary_enabled", True):
+            return
+        state = self._session_state(session_id)
+        # Server-side rings forget their oldest turns; positions stay counted from the session start
+        offset = getattr(conversation_history, "evicted", 0)
+        if offset + dropped <= state["summarized_turns"] and offset + len(conversation_history) >= state["summarized_turns"]:
+            return
+        self.summary_executor.submit(self.summarizer.fold, state, list(conversation_history), offset + dropped, offset)
+
+    def resolve_deadline(self, deadline_ms=None):
+        """Per-request deadline in seconds (request value, else config default; None = no deadline)"""
+        if deadline_ms is None:
+            deadline_ms = config_manager.get("chat_deadline_ms", 20000)
+        try:
+            deadline_ms = float(deadline_ms)
+        except (TypeError, ValueError):
+            return None
+        return deadline_ms / 1000.0 if deadline_ms > 0 else None
+
+    def get_ai_response_by_deadline(self, message, context, analysis, local_response, deadline):
+        """
+        Race the provider against the deadline while the caller already holds a
+        local answer; returns (response, ai_powered, fallback_reason)
+        """
+        if not self.use_real_ai:
+            return self._answered(local_response(), False, "real_ai_disabled")
+
+        future = self.executor.submit(self.get_ai_response, message, context, analysis)
+        # The cheap local answer is computed while the provider call is in flight
+        fallback = local_response()
+        try:
+            real_response = future.result(timeout=deadline)
+        except FutureTimeoutError:
+            # A call still queued for a worker is dropped; one already running keeps going
+            # so its late answer still lands in the response cache
+            if future.cancel():
+                logger.warning(f"⏱️ Provider call still queued at the {deadline}s deadline, cancelled; answering locally")
+            else:
+                logger.warning(f"⏱️ Provider missed the {deadline}s deadline, answering locally")
+            return self._answered(fallback, False, "deadline_exceeded")
+        except ProviderOverloaded:
+            self.ai_provider.metrics.record_response(False, "overloaded")
+            raise
+
+        if real_response:
+            return self._answered(real_response, True, None)
+        return self._answered(fallback, False, "provider_unavailable")
+
+    def _answered(self, response, ai_powered, fallback_reason):
+        """Count how the turn was answered and pass the result through"""
+        self.ai_provider.metrics.record_response(ai_powered, fallback_reason)
+        return response, ai_powered, fallback_reason
+
     def generate_smart_response(self, message, analysis):
         """Generate intelligent response based on analysis"""
         intents = analysis['intents']
@@ -677,7 +3520,7 @@ class ChronexAIPython:
         # General intelligent response
         return f"""🧠 **Intelligent Response Mode**\n\nI understand you're asking about: {message[:100]}{'...' if len(message) > 100 else ''}\n\nBased on my analysis:\n• Intent: {', '.join(intents)}\n{f"• Languages: {', '.join(entities['languages'])}" if entities['languages'] else ''}\n{f"• Topics: {', '.join(entities['topics'])}" if entities['topics'] else ''}\n\nI'm ready to provide detailed assistance. Could you provide more specifics so I can give you the best answer?"""
 
-    def process_message(self, message, conversation_history=None):
+    def process_message(self, message, conversation_history=None, deadline_ms=None, session_id=None):
         """Process incoming message with ENHANCED intelligence"""
         try:
             # Add to history
@@ -690,36 +3533,35 @@ class ChronexAIPython:
                 "timestamp": datetime.now().isoformat()
             })
 
+            # Purely local intents never reach a provider
+            fast_path = self._fast_path_result(message, conversation_history, session_id)
+            if fast_path:
+                return fast_path
+
             # DEEP MESSAGE ANALYSIS
             analysis = self.analyze_message(message)
             logger.info(f"📊 Analysis: Intents={analysis['intents']}, Entities={analysis['entities']}")
 
-            # Build rich conversation context
-            recent_context = "\n".join([
-                f"{msg.get('role', 'user')}: {msg.get('content', '')}"
-                for msg in conversation_history[-5:]
-            ])
+            # Build rich conversation context within the token budget
+            history_block, dropped = self._history_context(conversation_history, session_id)
 
             # Try real AI first with ENHANCED context
-            context = f"""You are CHRONEX AI, the ultimate neural assistant created by DEMON ALEX CREATOR OF CHRONEX AI.
-Your purpose is to provide high-precision technical assistance, advanced problem solving, and insightful analysis.
-Maintain a professional, slightly futuristic, and extremely intelligent persona.
+            context = f"""{CHRONEX_PERSONA_PROMPT}
 
-Recent conversation:
-{recent_context}
+{history_block}
 
 System Analysis:
 - User Intent: {', '.join(analysis['intents'])}
 - Complexity Level: {analysis['complexity']}
 - Entity Mapping: {analysis['entities']}"""
 
-            real_response = self.get_ai_response(message, context, analysis)
-            
-            if real_response:
-                response = real_response
-            else:
-                # Use intelligent fallback with analysis
-                response = self.generate_smart_response(message, analysis)
+            # Use intelligent fallback with analysis if the provider misses the deadline
+            deadline = self.resolve_deadline(deadline_ms)
+            response, ai_powered, fallback_reason = self.get_ai_response_by_deadline(
+                message, context, analysis,
+                lambda: self.generate_smart_response(message, analysis),
+                deadline
+            )
 
             # Add AI response to history
             conversation_history.append({
@@ -728,17 +3570,23 @@ System Analysis:
                 "timestamp": datetime.now().isoformat(),
                 "analysis": analysis
             })
+            self._schedule_summary(session_id, conversation_history, dropped)
 
             return {
                 "success": True,
                 "response": response,
                 "model": self.config["model"]["name"] + " (Enhanced)",
                 "history": conversation_history,
-                "ai_powered": real_response is not None,
+                "ai_powered": ai_powered,
+                "fallback_reason": fallback_reason,
                 "analysis": analysis
             }
 
+        except ProviderOverloaded:
+            self._discard_user_turn(conversation_history, message)
+            raise
         except Exception as e:
+            self._discard_user_turn(conversation_history, message)
             logger.error(f"Error processing message: {str(e)}")
             return {
                 "success": False,
@@ -746,7 +3594,7 @@ System Analysis:
                 "response": "⚠️ An error occurred while processing your message. Please try again."
             }
 
-    def process_message_simplified(self, message, conversation_history=None):
+    def process_message_simplified(self, message, conversation_history=None, deadline_ms=None, session_id=None):
         """Simplified intelligent message processor - no rigid categories"""
         try:
             if conversation_history is None:
@@ -759,33 +3607,20 @@ System Analysis:
                 "timestamp": datetime.now().isoformat()
             })
 
-            # Build smart context from conversation history
-            context_messages = conversation_history[-5:]  # Last 5 messages
-            conversation_context = "\n".join([
-                f"{msg.get('role', 'user')}: {msg.get('content', '')}"
-                for msg in context_messages
-            ])
+            # Purely local intents never reach a provider
+            fast_path = self._fast_path_result(message, conversation_history, session_id)
+            if fast_path:
+                return fast_path
 
             # Intelligent AI response with full context awareness
-            context = f"""You are CHRONEX AI, the advanced intelligence directive from DEMON ALEX CREATOR OF CHRONEX AI.
-You excel at programming, mathematics, architecture, and tactical analysis.
-Provide detailed, structured, and highly valuable responses.
+            context, dropped = self._simplified_context(conversation_history, session_id)
 
-Recent conversation:
-{conversation_context}"""
-
-            response = self.get_ai_response(message, context)
-            
-            if not response:
-                # Fallback with helpful generic response
-                response = """💭 I'm here to help! Feel free to ask me about:
-- Programming and code help
-- Math and calculations
-- Data science questions  
-- General advice and conversation
-- And much more!
-
-What would you like to discuss?"""
+            # Fallback with helpful generic response if the provider misses the deadline
+            response, ai_powered, fallback_reason = self.get_ai_response_by_deadline(
+                message, context, None,
+                lambda: SIMPLIFIED_FALLBACK_RESPONSE,
+                self.resolve_deadline(deadline_ms)
+            )
 
             # Add to history
             conversation_history.append({
@@ -793,15 +3628,22 @@ What would you like to discuss?"""
                 "content": response,
                 "timestamp": datetime.now().isoformat()
             })
+            self._schedule_summary(session_id, conversation_history, dropped)
 
             return {
                 "success": True,
                 "response": response,
                 "model": self.config["model"]["name"],
-                "history": conversation_history
+                "history": conversation_history,
+                "ai_powered": ai_powered,
+                "fallback_reason": fallback_reason
             }
 
+        except ProviderOverloaded:
+            self._discard_user_turn(conversation_history, message)
+            raise
         except Exception as e:
+            self._discard_user_turn(conversation_history, message)
             logger.error(f"Message processing error: {str(e)}")
             return {
                 "success": False,
@@ -809,6 +3651,118 @@ What would you like to discuss?"""
                 "response": "Sorry, I encountered an issue. Please try again."
             }
 
+    def _simplified_context(self, conversation_history, session_id=None):
+        """Build smart context from conversation history; returns (context, dropped turns)"""
+        history_block, dropped = self._history_context(conversation_history, session_id)
+
+        return f"""{SIMPLIFIED_PERSONA_PROMPT}
+
+{history_block}""", dropped
+
+    def process_message_stream(self, message, conversation_history=None, session_id=None, delta=False, include_history=False):
+        """Stream the simplified processor's answer as SSE events, then send the final turn"""
+        try:
+            if conversation_history is None:
+                conversation_history = []
+
+            conversation_history.append({
+                "role": "user",
+                "content": message,
+                "timestamp": datetime.now().isoformat()
+            })
+
+            fast_path = self._fast_path_result(message, conversation_history, session_id)
+            if fast_path:
+                yield sse_event("token", {"token": fast_path["response"]})
+                yield sse_event("done", self.session_reply(fast_path, session_id, include_history) if delta else fast_path)
+                return
+
+            context, dropped = self._simplified_context(conversation_history, session_id)
+            tokens = []
+            if self.use_real_ai:
+                # Streams cannot escalate once tokens are sent, so only the routed tier is used
+                route = self._cascade_route(message)[0][1] if self.ai_provider.cascade.enabled else None
+                for token in self.ai_provider.stream_response(message, context, route):
+                    tokens.append(token)
+                    yield sse_event("token", {"token": token})
+
+            ai_powered = bool(tokens)
+            fallback_reason = None if ai_powered else ("provider_unavailable" if self.use_real_ai else "real_ai_disabled")
+            self.ai_provider.metrics.record_response(ai_powered, fallback_reason)
+            response = "".join(tokens) if ai_powered else SIMPLIFIED_FALLBACK_RESPONSE
+            if not ai_powered:
+                logger.info(f"⚡ Using default response (stream unavailable)")
+                yield sse_event("token", {"token": response})
+
+            # History only gets the assistant turn once the stream is complete
+            conversation_history.append({
+                "role": "assistant",
+                "content": response,
+                "timestamp": datetime.now().isoformat()
+            })
+            self._schedule_summary(session_id, conversation_history, dropped)
+
+            done = {
+                "success": True,
+                "response": response,
+                "model": self.config["model"]["name"],
+                "history": conversation_history,
+                "ai_powered": ai_powered
+            }
+            yield sse_event("done", self.session_reply(done, session_id, include_history) if delta else done)
+
+        except GeneratorExit:
+            self._discard_user_turn(conversation_history, message)  # client left before the answer was stored
+            raise
+        except Exception as e:
+            self._discard_user_turn(conversation_history, message)
+            logger.error(f"Message stream error: {str(e)}")
+            yield sse_event("error", {
+                "success": False,
+                "error": str(e),
+                "response": "Sorry, I encountered an issue. Please try again."
+            })
+
+    def process_batch(self, items, deadline_ms=None):
+        """
+        Answer batch items concurrently, yielding (index, result) as each finishes
+        Items of one session run in input order so its turns are never interleaved
+        """
+        groups = OrderedDict()
+        for index, item in enumerate(items):
+            session_id = (item.get("session") or item.get("session_id")) if isinstance(item, dict) else None
+            groups.setdefault(session_id or ("item", index), []).append(index)
+
+        results = queue.Queue()
+
+        def run_group(indices):
+            for index in indices:
+                results.put((index, self._batch_item(items[index], deadline_ms)))
+
+        for indices in groups.values():
+            self.batch_executor.submit(run_group, indices)
+        for _ in range(len(items)):
+            yield results.get()
+
+    def _batch_item(self, item, deadline_ms=None):
+        """One batch item, answered like /ai/chat; failures become a per-item error"""
+        if not isinstance(item, dict) or not item.get("message"):
+            return {"success": False, "error": "No message provided"}
+        message = item["message"]
+        session_id = item.get("session") or item.get("session_id")
+        try:
+            if session_id and "history" not in item:
+                history = self._session_state(session_id)["history"]
+                with self.sessions.turn_lock(session_id):
+                    result = self.process_message_simplified(message, history, deadline_ms, session_id)
+                return self.session_reply(result, session_id, bool(item.get("include_history", False)))
+            return self.process_message_simplified(message, item.get("history", []), deadline_ms, session_id)
+        except ProviderOverloaded as e:
+            return {"success": False, "error": str(e), "reason": e.reason, "retry_after": e.retry_after}
+        except Exception as e:
+            logger.error(f"Batch item error: {str(e)}")
+            return {"success": False, "error": str(e)}
+
     def detect_message_type(self, message):
         """Detect message type for analytics (no longer used for routing)"""
         msg_lower = message.lower()
@@ -821,8 +3775,8 @@ What would you like to discuss?"""
         else:
             return "general"
 
-    def handle_creator_query(self, message):
-        """Handle creator information queries"""
+    def handle_creator_query(self, message, record=True):
+        """Handle creator information queries (record=False skips the library write)"""
         creator_responses = [
             f"""👨‍💻 **Creator Information**\n\nChronex AI was built by:\n\n**Primary Creator:** {CREATOR}\n**Secondary Creator:** {SECONDARY_CREATOR}\n\n**System:** Chronex AI Python Backend\n**Version:** 1.0\n**Created:** {datetime.now().strftime('%Y')}\n\n✨ Built with passion for advanced AI solutions!""",
             
@@ -834,7 +3788,8 @@ What would you like to discuss?"""
         ]
         
         # Store query in library
-        creator_library.add_query(message, "creator")
+        if record:
+            creator_library.add_query(message, "creator")
         
         return def_random(creator_responses)
 
@@ -849,13 +3804,13 @@ What would you like to discuss?"""
         ]
         return def_random(advanced_responses)
 
-    def check_status(self, message):
-        """Check system status when user asks"""
-        import psutil
-        
+    def check_status(self, message, record=True):
+        """Check system status when user asks (record=False skips the library write)"""
         try:
-            # Get system info
-            cpu_percent = psutil.cpu_percent(interval=1)
+            import psutil
+
+            # Get system info (non-blocking: utilisation since the previous call)
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
             
             status_responses = [
@@ -869,7 +3824,8 @@ What would you like to discuss?"""
             ]
             
             # Store status query in library
-            creator_library.add_query(message, "status")
+            if record:
+                creator_library.add_query(message, "status")
             
             return def_random(status_responses)
         except ImportError:
@@ -1244,8 +4200,10 @@ def get_capabilities():
 @app.route('/ai/health', methods=['GET'])
 def health_check():
     """Detailed health check"""
+    readiness = chronex_python.ai_provider.readiness()
     return jsonify({
-        "status": "healthy",
+        "status": {"ready": "healthy", "warming": "warming", "failed": "unhealthy"}.get(readiness["state"], "degraded"),
+        "provider": readiness,
         "uptime": "running",
         "model": CHRONEX_CONFIG["model"]["name"],
         "capabilities": list(CHRONEX_CONFIG["capabilities"].keys()),
@@ -1406,24 +4364,83 @@ def get_providers():
             "ollama": True,  # Always available if server running
             "default": True
         },
-        "current_provider": config_manager.get("ai_provider")
+        "huggingface_backend": chronex_python.ai_provider.hf_backend,
+        "local_backends": {"onnx": ONNX_AVAILABLE, "int8": TORCH_AVAILABLE},
+        "current_provider": config_manager.get("ai_provider"),
+        "provider_chain": chronex_python.ai_provider.chain,
+        "circuit_breakers": {name: breaker.snapshot() for name, breaker in chronex_python.ai_provider.breakers.items()},
+        "coalescing": chronex_python.ai_provider.single_flight.stats(),
+        "concurrency": {name: limiter.stats() for name, limiter in chronex_python.ai_provider.limiters.items()},
+        "openai_keys": chronex_python.ai_provider.openai_keys.stats(),
+        "ollama_residency": chronex_python.ai_provider.ollama_residency() if "ollama" in chronex_python.ai_provider.providers else None,
+        "cascade": chronex_python.ai_provider.cascade.stats(),
+        "fast_path": chronex_python.fast_path.stats(),
+        "sessions": chronex_python.sessions.stats(),
+        "timeouts": {
+            name: {**timeout.snapshot(), "retries": chronex_python.ai_provider.retry_policies[name].counters}
+            for name, timeout in chronex_python.ai_provider.timeouts.items()
+        },
+        "inference_worker": chronex_python.ai_provider.inference_worker.stats() if chronex_python.ai_provider.inference_worker else None,
+        "prefix_cache": chronex_python.ai_provider.prefix_cache.stats()
     })
 
+@app.route('/ai/metrics', methods=['GET'])
+def get_metrics():
+    """Provider telemetry in Prometheus text format"""
+    return Response(chronex_python.ai_provider.prometheus_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/ai/cache', methods=['GET'])
+def get_cache_stats():
+    """Get response cache hit/miss statistics"""
+    return jsonify({
+        "success": True,
+        "cache": chronex_python.ai_provider.response_cache.stats()
+    })
+
+@app.route('/ai/cache/clear', methods=['POST'])
+def clear_cache():
+    """Clear the response cache (optionally a single provider namespace)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        namespace = data.get('provider')
+        try:
+            chronex_python.ai_provider.response_cache.clear(namespace)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        return jsonify({
+            "success": True,
+            "message": f"Response cache cleared{f' for {namespace}' if namespace else ''}"
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/ai/chat', methods=['POST'])
 def chat():
     """Main chat endpoint - uses intelligent context-aware responses"""
     try:
         data = request.get_json()
         message = data.get('message', '')
-        history = data.get('history', [])
 
         if not message:
             return jsonify({"error": "No message provided"}), 400
 
+        # Without a history array the conversation lives server-side under session_id
+        history, session_id, delta = chronex_python.session_history(data)
+        include_history = bool(data.get('include_history', False))
+
+        if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return stream_chat_response(message, history, session_id, delta, include_history)
+
         # Use the new simplified intelligent processor
-        result = chronex_python.process_message_simplified(message, history)
+        deadline_ms = request.headers.get('X-Chronex-Deadline-Ms', data.get('deadline_ms'))
+        with chronex_python.sessions.turn_lock(session_id) if delta else nullcontext():
+            result = chronex_python.process_message_simplified(message, history, deadline_ms, session_id)
+        if delta:
+            result = chronex_python.session_reply(result, session_id, include_history)
         return jsonify(result)
 
+    except ProviderOverloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Chat endpoint error: {str(e)}")
         return jsonify({
@@ -1431,6 +4448,90 @@ def chat():
             "error": str(e)
         }), 500
 
+def overloaded_response(error):
+    """Fast 503 telling the client when to retry instead of letting it time out"""
+    response = jsonify({
+        "success": False,
+        "error": str(error),
+        "reason": error.reason,
+        "retry_after": error.retry_after
+    })
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+def stream_chat_response(message, history, session_id=None, delta=False, include_history=False):
+    """Wrap the streaming processor in a Server-Sent Events response"""
+    def events():
+        with chronex_python.sessions.turn_lock(session_id) if delta else nullcontext():
+            yield from chronex_python.process_message_stream(message, history, session_id, delta, include_history)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/ai/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint - sends tokens as Server-Sent Events"""
+    try:
+        data = request.get_json()
+        message = data.get('message', '')
+
+        if not message:
+            return jsonify({"error": "No message provided"}), 400
+
+        history, session_id, delta = chronex_python.session_history(data)
+        return stream_chat_response(message, history, session_id, delta, bool(data.get('include_history', False)))
+
+    except Exception as e:
+        logger.error(f"Chat stream endpoint error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/ai/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer many {session, message} items in one request; results keep the input order"""
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"success": False, "error": "Provide a non-empty items array"}), 400
+        max_items = config_manager.get("chat_batch_max_items", 64)
+        if len(items) > max_items:
+            return jsonify({"success": False, "error": f"At most {max_items} items per batch"}), 413
+
+        deadline_ms = request.headers.get('X-Chronex-Deadline-Ms', data.get('deadline_ms') if isinstance(data, dict) else None)
+        stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes') or (isinstance(data, dict) and bool(data.get('stream')))
+
+        if stream:
+            # Partial results as Server-Sent Events, in completion order and tagged with their index
+            def events():
+                for index, result in chronex_python.process_batch(items, deadline_ms):
+                    yield sse_event("result", {"index": index, **result})
+                yield sse_event("done", {"success": True, "count": len(items)})
+
+            return Response(
+                stream_with_context(events()),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        results = [None] * len(items)
+        for index, result in chronex_python.process_batch(items, deadline_ms):
+            results[index] = result
+        return jsonify({"success": True, "count": len(items), "results": results})
+
+    except Exception as e:
+        logger.error(f"Chat batch endpoint error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/ai/analyze-code', methods=['POST'])
 def analyze_code():
     """Dedicated code analysis endpoint"""
@@ -1468,18 +4569,40 @@ def solve_math():
 @app.route('/ai/status', methods=['GET'])
 def status():
     """Health check endpoint"""
+    readiness = chronex_python.ai_provider.readiness()
     return jsonify({
-        "status": "online",
+        "status": "warming" if readiness["state"] == "warming" else "online",
+        "provider_state": readiness["state"],
         "model": CHRONEX_CONFIG["model"]["name"],
         "version": "1.0",
         "capabilities": list(CHRONEX_CONFIG["capabilities"].keys())
     })
 
+@app.route('/ai/session', methods=['POST'])
+def create_session():
+    """Open a server-side session for the delta chat protocol"""
+    session_id = SessionStore.new_id()
+    chronex_python.sessions.get(session_id)
+    return jsonify({"success": True, "session_id": session_id})
+
+@app.route('/ai/session/<session_id>/history', methods=['GET'])
+def session_history(session_id):
+    """Full stored history of a server-side session (the delta protocol never sends it)"""
+    state = chronex_python.sessions.get(session_id, create=False)
+    if state is None:
+        return jsonify({"success": False, "error": "Unknown session"}), 404
+    return jsonify({"success": True, "session_id": session_id, "history": state["history"].to_list()})
+
 @app.route('/ai/reset', methods=['POST'])
 def reset():
-    """Reset conversation history"""
-    chronex_python.conversation_history = []
-    return jsonify({"success": True, "message": "Conversation history cleared"})
+    """Reset one session's server-side history and context"""
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id') or request.args.get('session_id')
+    if not session_id:
+        # Clients that keep their own history just start over; nobody else's session is touched
+        return jsonify({"success": True, "message": "Conversation history cleared"})
+    removed = chronex_python.sessions.reset(session_id)
+    return jsonify({"success": True, "session_id": session_id, "removed": removed, "message": "Conversation history cleared"})
 
 # ============ IMAGE PROCESSING ENDPOINTS ============
 
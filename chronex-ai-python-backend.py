@@ -12,29 +12,52 @@ import json
 import os
 import random
 import string
+import threading
+import time
+import importlib
+import importlib.util
 from datetime import datetime
 import logging
 import base64
 from pathlib import Path
 
-# Try importing AI libraries
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+# Heavy AI libraries are imported lazily on first use so the server can
+# start answering (e.g. /ai/health) before they are loaded
+class LazyModule:
+    """Module proxy that defers an expensive import until an attribute is used"""
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    object.__setattr__(self, "_module", importlib.import_module(self._name))
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+def module_available(name):
+    """Check a library is installed without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
 
-try:
-    from transformers import pipeline
-    HUGGINGFACE_AVAILABLE = True
-except ImportError:
-    HUGGINGFACE_AVAILABLE = False
+OPENAI_AVAILABLE = module_available("openai")
+openai = LazyModule("openai")
 
-try:
-    from PIL import Image
-    PILLOW_AVAILABLE = True
-except ImportError:
-    PILLOW_AVAILABLE = False
+HUGGINGFACE_AVAILABLE = module_available("transformers")
+transformers = LazyModule("transformers")
+
+PILLOW_AVAILABLE = module_available("PIL")
+Image = LazyModule("PIL.Image")
 
 try:
     from dotenv import load_dotenv
@@ -185,6 +208,7 @@ class ConfigManager:
             "temperature": float(os.getenv("AI_TEMPERATURE", "0.7")),
             "max_tokens": int(os.getenv("AI_MAX_TOKENS", "1000")),
             "use_real_ai": to_bool(os.getenv("USE_REAL_AI", "True")),
+            "background_warmup": to_bool(os.getenv("BACKGROUND_WARMUP", "True")),  # load models after startup
             "enable_vision": to_bool(os.getenv("ENABLE_VISION", "True")),
         }
         
@@ -218,15 +242,51 @@ class RealAIProvider:
     def __init__(self, config):
         self.config = config
         self.provider = config.get("ai_provider", "openai")
-        self.setup_provider()
+        self.start_warmup()
     
+    def start_warmup(self):
+        """Load the configured provider in the background so startup is not blocked"""
+        self.state = "warming"
+        self.warmup_error = None
+        self.warmup_seconds = None
+        if self.config.get("background_warmup", True):
+            threading.Thread(target=self._warm_up, name="provider-warmup", daemon=True).start()
+        else:
+            self._warm_up()
+
+    def _warm_up(self):
+        started = time.monotonic()
+        try:
+            self.setup_provider()
+            self.state = "ready"
+        except Exception as e:
+            self.state = "failed"
+            self.warmup_error = str(e)
+            logger.error(f"❌ Provider warm-up failed: {e}")
+        self.warmup_seconds = round(time.monotonic() - started, 3)
+        logger.info(f"🔥 Provider warm-up finished: {self.state} in {self.warmup_seconds}s")
+
+    @property
+    def is_ready(self):
+        """True once the configured provider has finished loading"""
+        return self.state == "ready"
+
+    def readiness(self):
+        """Warm-up state for health endpoints"""
+        return {
+            "state": self.state,
+            "provider": self.provider,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.warmup_error,
+        }
+
     def setup_provider(self):
         """Setup the AI provider"""
         if self.provider == "openai" and OPENAI_AVAILABLE:
             openai.api_key = self.config.get("openai_api_key", "")
             logger.info("✅ OpenAI provider initialized")
         elif self.provider == "huggingface" and HUGGINGFACE_AVAILABLE:
-            self.pipe = pipeline("text-generation", model=self.config.get("huggingface_model", "gpt2"))
+            self.pipe = transformers.pipeline("text-generation", model=self.config.get("huggingface_model", "gpt2"))
             logger.info("✅ Hugging Face provider initialized")
         else:
             logger.warning("⚠️ No real AI provider available, using default responses")
@@ -236,6 +296,9 @@ class RealAIProvider:
         try:
             if not self.config.get("use_real_ai", True):
                 return None
+            if not self.is_ready:
+                logger.info(f"⏳ Provider {self.state}, using default response")
+                return None
             
             if self.provider == "openai" and OPENAI_AVAILABLE:
                 return self.openai_response(message, context)
@@ -975,8 +1038,10 @@ def get_capabilities():
 @app.route('/ai/health', methods=['GET'])
 def health_check():
     """Detailed health check"""
+    readiness = chronex_python.ai_provider.readiness()
     return jsonify({
-        "status": "healthy",
+        "status": {"ready": "healthy", "warming": "warming", "failed": "unhealthy"}.get(readiness["state"], "degraded"),
+        "provider": readiness,
         "uptime": "running",
         "model": CHRONEX_CONFIG["model"]["name"],
         "capabilities": list(CHRONEX_CONFIG["capabilities"].keys()),
@@ -1203,8 +1268,10 @@ def get_config():
 @app.route('/ai/status', methods=['GET'])
 def status():
     """Health check endpoint"""
+    readiness = chronex_python.ai_provider.readiness()
     return jsonify({
-        "status": "online",
+        "status": "warming" if readiness["state"] == "warming" else "online",
+        "provider_state": readiness["state"],
         "model": CHRONEX_CONFIG["model"]["name"],
         "version": "1.0",
         "capabilities": list(CHRONEX_CONFIG["capabilities"].keys())
@@ -0,0 +1,417 @@
+"""
+CHRONEX AI - Provider Stub Server
+Offline stand-in for Ollama and the OpenAI ChatCompletion API, for load testing
+/ai/chat, /ai/scan-image and /ai/image-vision without API keys or a running model
+Python: 3.8+ (standard library only)
+
+Usage:
+    python chronex-ai-stub-server.py --port 8808 --latency lognormal:0.3:0.4 --tokens-per-second 40 --errors 0.02:429,503,reset
+
+Point the backend at it:
+    OLLAMA_ENDPOINT=http://127.0.0.1:8808
+    OPENAI_API_BASE=http://127.0.0.1:8808/v1  OPENAI_API_KEY=stub
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("chronex-stub")
+
+STUB_WORDS = (
+    "chronex neural analysis indicates the request is well formed and the answer "
+    "follows a structured plan with examples code and a short summary of next steps"
+).split()
+
+# ============ BEHAVIOUR MODEL ============
+class LatencyModel:
+    """
+    Time before the first token, sampled from a distribution spec:
+    fixed:S, uniform:LO:HI, normal:MEAN:STD, lognormal:MEDIAN:SIGMA, exponential:MEAN
+    """
+    def __init__(self, spec, rng):
+        self.spec = spec
+        self.rng = rng
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        samplers = {
+            "fixed": lambda p: p[0],
+            "uniform": lambda p: self.rng.uniform(p[0], p[1]),
+            "normal": lambda p: self.rng.gauss(p[0], p[1]),
+            "lognormal": lambda p: p[0] * self.rng.lognormvariate(0.0, p[1]),
+            "exponential": lambda p: self.rng.expovariate(1.0 / p[0]),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self._sample = samplers[kind]
+
+    def sample(self):
+        return max(0.0, self._sample(self.params))
+
+class StubBehaviour:
+    """Shared, seeded randomness for latency, token counts and injected errors"""
+    def __init__(self, latency="fixed:0.05", tokens_per_second=50.0, response_tokens=64,
+                 error_rate=0.0, error_kinds=(503,), seed=None, model="stub-model", cold_start=0.0):
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.latency = LatencyModel(latency, self.rng)
+        self.tokens_per_second = float(tokens_per_second)
+        self.response_tokens = int(response_tokens)
+        self.error_rate = float(error_rate)
+        self.error_kinds = list(error_kinds)
+        self.model = model
+        self.cold_start = float(cold_start)
+        self.resident = {}  # model -> monotonic expiry, like Ollama's loaded models
+        self.counters = {"requests": 0, "streams": 0, "errors_injected": 0, "tokens_generated": 0, "cold_loads": 0}
+        self.started = time.time()
+
+    def first_token_delay(self):
+        with self._lock:
+            return self.latency.sample()
+
+    def token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def pick_error(self):
+        """An injected failure (HTTP status or "reset") for this request, or None"""
+        with self._lock:
+            if self.error_rate <= 0 or self.rng.random() >= self.error_rate:
+                return None
+            self.counters["errors_injected"] += 1
+            return self.rng.choice(self.error_kinds)
+
+    def load_model(self, model, keep_alive):
+        """Seconds of cold-load delay to simulate, and mark the model resident until keep_alive expires"""
+        now = time.monotonic()
+        with self._lock:
+            cold = self.resident.get(model, 0.0) <= now
+            if cold:
+                self.counters["cold_loads"] += 1
+            ttl = parse_keep_alive(keep_alive)
+            if ttl == 0:
+                self.resident.pop(model, None)
+            else:
+                self.resident[model] = now + ttl
+        return self.cold_start if cold else 0.0
+
+    def loaded_models(self):
+        """Models currently resident, in the /api/ps shape"""
+        now = time.monotonic()
+        with self._lock:
+            self.resident = {model: expiry for model, expiry in self.resident.items() if expiry > now}
+            loaded = list(self.resident.items())
+        models = []
+        for model, expiry in loaded:
+            expires = "0001-01-01T00:00:00Z" if expiry == float("inf") else \
+                (datetime.now(timezone.utc) + timedelta(seconds=expiry - now)).isoformat()
+            models.append({"name": model, "model": model, "size_vram": 0, "expires_at": expires})
+        return models
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def tokens_for(self, prompt):
+        """Deterministic answer tokens for a prompt (same prompt, same answer)"""
+        seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "big")
+        rng = random.Random(seed)
+        words = [rng.choice(STUB_WORDS) for _ in range(self.response_tokens)]
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "latency": self.latency.spec,
+                "tokens_per_second": self.tokens_per_second,
+                "response_tokens": self.response_tokens,
+                "error_rate": self.error_rate,
+                "error_kinds": self.error_kinds,
+                "model": self.model,
+                "cold_start": self.cold_start,
+            }
+
+def parse_keep_alive(value, default=300.0):
+    """Ollama keep_alive ("30m", "45s", "1h", seconds, -1 = forever) in seconds"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value).strip()
+        units = {"s": 1, "m": 60, "h": 3600}
+        seconds = float(text[:-1]) * units[text[-1]] if text[-1] in units else float(text)
+    return float("inf") if seconds < 0 else seconds
+
+def parse_errors(spec):
+    """"0.05:429,503,reset" -> (0.05, [429, 503, "reset"])"""
+    if not spec:
+        return 0.0, [503]
+    rate, _, kinds = spec.partition(":")
+    parsed = [kind if kind == "reset" else int(kind) for kind in (kinds or "503").split(",") if kind]
+    return float(rate), parsed
+
+def approx_tokens(text):
+    return max(1, len(text) // 4)
+
+# ============ HTTP HANDLER ============
+class StubHandler(BaseHTTPRequestHandler):
+    """Ollama (/api/*) and OpenAI (/v1/*) endpoints backed by StubBehaviour"""
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real servers
+    behaviour = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    # ----- plumbing -----
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _inject_error(self, openai_shape):
+        """Send an injected failure; returns True when the request is done"""
+        error = self.behaviour.pick_error()
+        if error is None:
+            return False
+        if error == "reset":
+            self.close_connection = True
+            self.connection.close()
+            return True
+        message = f"Injected stub error {error}"
+        headers = {"Retry-After": "1"} if error == 429 else None
+        body = {"error": {"message": message, "type": "stub_error", "code": error}} if openai_shape else {"error": message}
+        self._send_json(error, body, headers)
+        return True
+
+    # ----- routing -----
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": self.behaviour.model, "model": self.behaviour.model}]})
+        elif self.path == "/api/ps":
+            self._send_json(200, {"models": self.behaviour.loaded_models()})
+        elif self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": self.behaviour.model, "object": "model"}]})
+        elif self.path in ("/", "/stats"):
+            self._send_json(200, self.behaviour.stats())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
+        self.behaviour.count("requests")
+        if self.path == "/api/generate":
+            self.ollama_generate(body)
+        elif self.path in ("/v1/chat/completions", "/chat/completions"):
+            self.openai_chat(body)
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    # ----- Ollama -----
+    def ollama_generate(self, body):
+        if self._inject_error(openai_shape=False):
+            return
+        prompt = body.get("prompt", "")
+        model = body.get("model") or self.behaviour.model
+        started = time.monotonic()
+        time.sleep(self.behaviour.load_model(model, body.get("keep_alive")))
+        if not prompt:
+            # Ollama's preload idiom: load the model and answer immediately
+            self._send_json(200, self._ollama_final(model, prompt, [], started, ""))
+            return
+        tokens = self.behaviour.tokens_for(prompt)
+        time.sleep(self.behaviour.first_token_delay())
+
+        if body.get("stream", True):
+            self.behaviour.count("streams")
+            self._start_chunked("application/x-ndjson")
+            for token in tokens:
+                time.sleep(self.behaviour.token_delay())
+                line = {"model": model, "created_at": self._now(), "response": token, "done": False}
+                self._write_chunk((json.dumps(line) + "\n").encode("utf-8"))
+            final = self._ollama_final(model, prompt, tokens, started, "")
+            self._write_chunk((json.dumps(final) + "\n").encode("utf-8"))
+            self._end_chunked()
+        else:
+            time.sleep(self.behaviour.token_delay() * len(tokens))
+            self._send_json(200, self._ollama_final(model, prompt, tokens, started, "".join(tokens)))
+        self.behaviour.count("tokens_generated", len(tokens))
+
+    def _ollama_final(self, model, prompt, tokens, started, response):
+        return {
+            "model": model,
+            "created_at": self._now(),
+            "response": response,
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.monotonic() - started) * 1e9),
+            "prompt_eval_count": approx_tokens(prompt),
+            "eval_count": len(tokens),
+        }
+
+    # ----- OpenAI -----
+    def openai_chat(self, body):
+        if self._inject_error(openai_shape=True):
+            return
+        prompt, images = self._flatten_messages(body.get("messages", []))
+        if images:
+            prompt = f"{prompt} [{images} image(s)]"
+        model = body.get("model") or self.behaviour.model
+        tokens = self.behaviour.tokens_for(prompt)
+        limit = body.get("max_tokens")
+        if limit:
+            tokens = tokens[:int(limit)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        time.sleep(self.behaviour.first_token_delay())
+
+        if body.get("stream"):
+            self.behaviour.count("streams")
+            self._start_chunked("text/event-stream")
+            first = True
+            for token in tokens:
+                time.sleep(self.behaviour.token_delay())
+                delta = {"role": "assistant", "content": token} if first else {"content": token}
+                first = False
+                self._sse(self._chat_chunk(completion_id, model, delta, None))
+            self._sse(self._chat_chunk(completion_id, model, {}, "stop"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._end_chunked()
+        else:
+            time.sleep(self.behaviour.token_delay() * len(tokens))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": approx_tokens(prompt),
+                    "completion_tokens": len(tokens),
+                    "total_tokens": approx_tokens(prompt) + len(tokens),
+                },
+            }, headers={
+                "x-ratelimit-remaining-requests": "10000",
+                "x-ratelimit-remaining-tokens": "1000000",
+            })
+        self.behaviour.count("tokens_generated", len(tokens))
+
+    @staticmethod
+    def _flatten_messages(messages):
+        """Text of all messages; vision content lists contribute their text parts and an image count"""
+        parts, images = [], 0
+        for message in messages:
+            content = message.get("content", "")
+            if isinstance(content, list):
+                for item in content:
+                    if item.get("type") == "text":
+                        parts.append(item.get("text", ""))
+                    elif item.get("type") == "image_url":
+                        images += 1
+            else:
+                parts.append(str(content))
+        return "\n".join(parts), images
+
+    @staticmethod
+    def _chat_chunk(completion_id, model, delta, finish_reason):
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    def _sse(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).isoformat()
+
+def make_server(host="127.0.0.1", port=8808, **behaviour):
+    """Build (but do not start) a stub server; port 0 picks a free port"""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"behaviour": StubBehaviour(**behaviour)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama/OpenAI compatible stub server for CHRONEX AI load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="time to first token: fixed:S, uniform:LO:HI, normal:MEAN:STD, lognormal:MEDIAN:SIGMA, exponential:MEAN")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="generation rate; 0 = instant")
+    parser.add_argument("--response-tokens", type=int, default=64, help="tokens per answer")
+    parser.add_argument("--errors", default="", help="RATE:KINDS, e.g. 0.05:429,500,503,reset")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible latency and error sequences")
+    parser.add_argument("--model", default="stub-model")
+    parser.add_argument("--cold-start", type=float, default=0.0, help="seconds an Ollama model takes to load when not resident")
+    args = parser.parse_args()
+
+    error_rate, error_kinds = parse_errors(args.errors)
+    server = make_server(
+        args.host, args.port,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        error_rate=error_rate,
+        error_kinds=error_kinds,
+        seed=args.seed,
+        model=args.model,
+        cold_start=args.cold_start,
+    )
+    logger.info(f"🧪 CHRONEX stub provider on http://{args.host}:{server.server_port}")
+    logger.info(f"   Ollama:  OLLAMA_ENDPOINT=http://{args.host}:{server.server_port}")
+    logger.info(f"   OpenAI:  OPENAI_API_BASE=http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("👋 Stub server stopped")
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()